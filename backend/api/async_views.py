@@ -0,0 +1,55 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from rest_framework.permissions import SAFE_METHODS
+
+# Each thread keeps its own database connection, so the pool size is also
+# the number of connections the read path may open.
+executor = ThreadPoolExecutor(
+    max_workers=settings.ASYNC_DB_THREADS,
+    thread_name_prefix='async-read'
+)
+
+
+def in_read_thread(view):
+    """Run ``view`` and render its response in a pool thread."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        close_old_connections()
+        try:
+            response = view(request, *args, **kwargs)
+            if hasattr(response, 'render') and callable(response.render):
+                response.render()
+            return response
+        finally:
+            close_old_connections()
+
+    return wrapper
+
+
+def async_read_view(viewset, actions, **initkwargs):
+    """Async view for ``viewset`` that serves safe methods concurrently.
+
+    Django 3.2 runs sync views under ASGI one at a time in a single thread.
+    GET and HEAD requests of this view are instead handled in a bounded
+    thread pool, so a slow query does not hold up other requests. Other
+    methods keep the default sync handling.
+    """
+    view = viewset.as_view(actions, **initkwargs)
+    read = sync_to_async(
+        in_read_thread(view), thread_sensitive=False, executor=executor
+    )
+    write = sync_to_async(view, thread_sensitive=True)
+
+    async def async_view(request, *args, **kwargs):
+        if request.method in SAFE_METHODS:
+            return await read(request, *args, **kwargs)
+        return await write(request, *args, **kwargs)
+
+    async_view.csrf_exempt = True
+    async_view.cls = viewset
+    async_view.actions = actions
+    return async_view
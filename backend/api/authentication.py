@@ -0,0 +1,149 @@
+import copy
+import hashlib
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.authentication import TokenAuthentication
+
+from .cache import bump_cache_version, get_cache_version
+from .metrics import current_metrics
+
+TOKEN_CACHE_PREFIX = 'auth-token'
+STATS = ('local_hits', 'shared_hits', 'misses', 'evictions', 'invalidations')
+
+
+def get_token_cache_key(key):
+    """Shared cache key of a token, the token itself is not stored."""
+    digest = hashlib.sha256(key.encode()).hexdigest()
+    return f'{TOKEN_CACHE_PREFIX}:{digest}'
+
+
+class TokenCache:
+    """Token owners in a bounded process-local LRU before the shared cache.
+
+    Entries live ``AUTH_TOKEN_LOCAL_TTL`` seconds in the process, at most
+    ``AUTH_TOKEN_LOCAL_SIZE`` of them, and ``AUTH_TOKEN_CACHE_TIMEOUT``
+    seconds in the shared cache. Invalidation removes a token from the
+    shared cache and bumps a revocation version there. Local entries keep
+    the version they were stored under and are checked against it on every
+    hit, so other processes stop accepting the token at once and reload
+    their other tokens from the shared cache.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._stats = Counter()
+
+    def get(self, key):
+        now = time.monotonic()
+        version = get_cache_version(TOKEN_CACHE_PREFIX)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, entry_version, user = entry
+                if expires > now and entry_version == version:
+                    self._entries.move_to_end(key)
+                    self._stats['local_hits'] += 1
+                    return user
+                del self._entries[key]
+
+        user = cache.get(get_token_cache_key(key))
+        with self._lock:
+            if user is None:
+                self._stats['misses'] += 1
+            else:
+                self._stats['shared_hits'] += 1
+                self._store(key, user, now, version)
+        return user
+
+    def set(self, key, user):
+        version = get_cache_version(TOKEN_CACHE_PREFIX)
+        cache.set(
+            get_token_cache_key(key), user, settings.AUTH_TOKEN_CACHE_TIMEOUT
+        )
+        with self._lock:
+            self._store(key, user, time.monotonic(), version)
+
+    def _store(self, key, user, now, version):
+        if settings.AUTH_TOKEN_LOCAL_TTL <= 0:
+            return
+        self._entries[key] = (
+            now + settings.AUTH_TOKEN_LOCAL_TTL, version, user
+        )
+        self._entries.move_to_end(key)
+        while len(self._entries) > settings.AUTH_TOKEN_LOCAL_SIZE:
+            self._entries.popitem(last=False)
+            self._stats['evictions'] += 1
+
+    def invalidate(self, keys):
+        keys = list(keys)
+        if not keys:
+            return
+        cache.delete_many([get_token_cache_key(key) for key in keys])
+        bump_cache_version(TOKEN_CACHE_PREFIX)
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+            self._stats['invalidations'] += len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._stats.clear()
+
+    def get_stats(self):
+        """Counters of this process since it started."""
+        with self._lock:
+            stats = {name: self._stats[name] for name in STATS}
+            stats.update(
+                pid=os.getpid(),
+                size=len(self._entries),
+                max_size=settings.AUTH_TOKEN_LOCAL_SIZE,
+            )
+        return stats
+
+
+token_cache = TokenCache()
+
+
+def invalidate_tokens(keys, using='default'):
+    """Drop cached tokens now and once more after the commit, so a request
+    that read the old user before the commit cannot cache it for long."""
+    keys = list(keys)
+    if not keys:
+        return
+    token_cache.invalidate(keys)
+    transaction.on_commit(lambda: token_cache.invalidate(keys), using)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication that keeps token owners in ``token_cache``.
+
+    Only valid tokens of active users are cached. Every request gets its
+    own copy of the cached user.
+    """
+
+    def authenticate_credentials(self, key):
+        metrics = current_metrics.get()
+        if metrics is None:
+            return self.get_credentials(key)
+        with metrics.timer('auth'):
+            return self.get_credentials(key)
+
+    def get_credentials(self, key):
+        user = token_cache.get(key)
+        if user is None:
+            user, token = super().authenticate_credentials(key)
+            cached = copy.copy(user)
+            # select_related() leaves the token on the user.
+            cached._state.fields_cache.pop('auth_token', None)
+            token_cache.set(key, cached)
+            return user, token
+        user = copy.copy(user)
+        return user, self.get_model()(key=key, user=user)
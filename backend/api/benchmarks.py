@@ -0,0 +1,138 @@
+import http.client
+import itertools
+import math
+import re
+import statistics
+import threading
+import time
+from pathlib import Path
+from urllib.parse import quote, urlsplit
+
+PERCENTILES = (50, 95, 99)
+SERVER_TIMING_QUERIES = re.compile(r'desc="(\d+) queries"')
+
+
+def percentile(values, percent):
+    """Nearest-rank percentile of already sorted ``values``."""
+    if not values:
+        return 0.0
+    rank = max(math.ceil(percent / 100 * len(values)), 1)
+    return values[rank - 1]
+
+
+def summarize(latencies, elapsed, errors=0, queries=None):
+    """Throughput and latency summary, latencies are in seconds."""
+    latencies = sorted(latencies)
+    summary = {
+        'requests': len(latencies),
+        'errors': errors,
+        'rps': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        'mean_ms': round(statistics.mean(latencies) * 1000, 2)
+        if latencies else 0.0,
+        'max_ms': round(latencies[-1] * 1000, 2) if latencies else 0.0,
+    }
+    for percent in PERCENTILES:
+        summary[f'p{percent}_ms'] = round(
+            percentile(latencies, percent) * 1000, 2
+        )
+    if queries:
+        summary['queries_mean'] = round(statistics.mean(queries), 1)
+        summary['queries_max'] = max(queries)
+    return summary
+
+
+def format_summary(label, summary):
+    latency = ' '.join(
+        f"p{percent}={summary[f'p{percent}_ms']}мс" for percent in PERCENTILES
+    )
+    line = (
+        f"{label}: {summary['rps']} запр/с, {latency}, "
+        f"max={summary['max_ms']}мс, ошибок: {summary['errors']}"
+    )
+    if 'queries_max' in summary:
+        line += f", запросов к БД: {summary['queries_max']}"
+    return line
+
+
+def run_http(url, path, headers, total, concurrency):
+    """Send ``total`` GET requests from ``concurrency`` threads.
+
+    Returns latencies, elapsed time, error count and query counts taken
+    from the ``Server-Timing`` header.
+    """
+    target = urlsplit(url)
+    path = quote(path, safe='/?=&')
+    counter = itertools.count()
+    lock = threading.Lock()
+    latencies = []
+    queries = []
+    errors = []
+
+    def worker():
+        connection = http.client.HTTPConnection(
+            target.hostname, target.port or 80, timeout=30
+        )
+        local_latencies = []
+        local_queries = []
+        local_errors = 0
+        while True:
+            with lock:
+                if next(counter) >= total:
+                    break
+            started = time.perf_counter()
+            try:
+                connection.request('GET', path, headers=headers)
+                response = connection.getresponse()
+                response.read()
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                local_errors += 1
+                continue
+            local_latencies.append(time.perf_counter() - started)
+            if response.status >= 400:
+                local_errors += 1
+            match = SERVER_TIMING_QUERIES.search(
+                response.getheader('Server-Timing', '')
+            )
+            if match:
+                local_queries.append(int(match.group(1)))
+        connection.close()
+        with lock:
+            latencies.extend(local_latencies)
+            queries.extend(local_queries)
+            errors.append(local_errors)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, time.perf_counter() - started, sum(errors), queries
+
+
+def get_children(pid):
+    children = []
+    for task in Path(f'/proc/{pid}/task').glob('*'):
+        try:
+            children += (task / 'children').read_text().split()
+        except OSError:
+            continue
+    return [int(child) for child in children]
+
+
+def process_tree_rss(pid):
+    """Resident memory of a process and its children in MiB, Linux only."""
+    total = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            status = Path(f'/proc/{current}/status').read_text()
+        except OSError:
+            continue
+        for line in status.splitlines():
+            if line.startswith('VmRSS:'):
+                total += int(line.split()[1])
+        pending += get_children(current)
+    return round(total / 1024, 1)
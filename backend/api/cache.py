@@ -0,0 +1,252 @@
+import hashlib
+import json
+import uuid
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils.cache import patch_vary_headers
+from rest_framework import status
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from recipes.models import Recipe
+from recipes.utils import schedule_on_commit
+from users.models import Subscribtion
+
+FEED_NAMESPACE = 'recipes'
+
+
+def get_cache_versions(namespaces):
+    """Current versions of several namespaces in one cache round trip."""
+    keys = [f'{namespace}:version' for namespace in namespaces]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if versions.get(key) is None:
+            cache.add(key, uuid.uuid4().hex, settings.REFERENCE_CACHE_TIMEOUT)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def get_cache_version(namespace):
+    return get_cache_versions((namespace,))[0]
+
+
+def bump_cache_versions(namespaces):
+    cache.set_many(
+        {f'{namespace}:version': uuid.uuid4().hex for namespace in namespaces},
+        settings.REFERENCE_CACHE_TIMEOUT
+    )
+
+
+def bump_cache_version(namespace):
+    bump_cache_versions((namespace,))
+
+
+def get_recipe_namespace(recipe_id):
+    return f'{FEED_NAMESPACE}:{recipe_id}'
+
+
+def get_author_namespace(author_id):
+    return f'authors:{author_id}'
+
+
+def invalidate_author(author_id, using='default'):
+    """Drop cached recipe payloads that embed the author on commit."""
+    transaction.on_commit(
+        lambda: bump_cache_version(get_author_namespace(author_id)), using
+    )
+
+
+def bump_recipe_feed(recipe_ids, using='default'):
+    bump_cache_versions([FEED_NAMESPACE] + [
+        get_recipe_namespace(recipe_id) for recipe_id in recipe_ids
+    ])
+
+
+def invalidate_recipe_feed(recipe_ids=(), using='default'):
+    """Drop cached recipe lists and the given recipes on commit.
+
+    Bumping after the commit keeps a request that still sees the old
+    rows from caching them under the new version.
+    """
+    schedule_on_commit(bump_recipe_feed, recipe_ids, using)
+
+
+class ReferenceCacheMixin:
+    """Versioned response cache with ETag validation for viewsets.
+
+    Responses of list and retrieve are cached under the current version of
+    ``cache_namespace``, which is bumped whenever the underlying data
+    changes. Requests with a matching ``If-None-Match`` header get 304
+    without touching the database.
+    """
+
+    cache_namespace = None
+
+    def perform_authentication(self, request):
+        # Reference data is the same for every user.
+        if request.method not in SAFE_METHODS:
+            super().perform_authentication(request)
+
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    def get_cached_response(self, handler, request, *args, **kwargs):
+        version = get_cache_version(self.cache_namespace)
+        digest = hashlib.md5(
+            f'{request.get_full_path()}|{request.accepted_media_type}'.encode()
+        ).hexdigest()
+        etag = f'"{self.cache_namespace}-{version}-{digest}"'
+
+        if etag in request.headers.get('If-None-Match', ''):
+            return self.add_cache_headers(
+                Response(status=status.HTTP_304_NOT_MODIFIED), etag
+            )
+
+        key = f'{self.cache_namespace}:{version}:{digest}'
+        data = cache.get(key)
+        if data is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            data = json.loads(JSONRenderer().render(response.data))
+            cache.set(key, data, settings.REFERENCE_CACHE_TIMEOUT)
+
+        return self.add_cache_headers(Response(data), etag)
+
+    def add_cache_headers(self, response, etag):
+        response['ETag'] = etag
+        response['Cache-Control'] = (
+            f'public, max-age={settings.REFERENCE_CACHE_MAX_AGE}'
+        )
+        patch_vary_headers(response, ('Accept',))
+        return response
+
+
+def get_payload_recipes(data):
+    """Recipes of a recipe list or recipe payload."""
+    return data['results'] if 'results' in data else [data]
+
+
+def get_author_versions(recipes):
+    author_ids = sorted({recipe['author']['id'] for recipe in recipes})
+    return dict(zip(
+        author_ids, get_cache_versions(map(get_author_namespace, author_ids))
+    ))
+
+
+def add_user_flags(data, user):
+    """Set the user's favorite, shopping cart and subscription flags
+    in a recipe list or recipe payload, with one query."""
+    recipes = get_payload_recipes(data)
+    if not recipes:
+        return
+    flags = {
+        recipe_id: recipe_flags
+        for recipe_id, *recipe_flags in Recipe.objects.filter(
+            id__in=[recipe['id'] for recipe in recipes]
+        ).with_user_flags(user).annotate(
+            author_followed=Exists(Subscribtion.objects.filter(
+                user=user, author=OuterRef('author')
+            ))
+        ).values_list(
+            'id', 'favorited_by_user', 'in_user_shopping_cart',
+            'author_followed'
+        )
+    }
+    for recipe in recipes:
+        favorited, in_shopping_cart, followed = flags.get(
+            recipe['id'], (False, False, False)
+        )
+        recipe['is_favorited'] = favorited
+        recipe['is_in_shopping_cart'] = in_shopping_cart
+        recipe['author']['is_subscribed'] = followed
+
+
+class RecipeFeedCacheMixin:
+    """Recipe list and detail cache shared by all users.
+
+    Payloads are rendered as for an anonymous user and cached by the
+    normalized query parameters under the feed version (lists) or the
+    recipe, tags and ingredients versions (details). Every entry also
+    keeps the versions of the authors it embeds, so a profile change
+    drops only the pages showing that author. Authenticated users
+    get the cached payload with their own flags merged in. Filters that
+    depend on the user are not cached.
+    """
+
+    feed_cache_params = (
+        'author', 'tags', 'tags_mode', 'search', 'page', 'limit',
+        'pagination', 'cursor', 'count',
+    )
+    feed_cache_bypass_params = ('is_favorited', 'is_in_shopping_cart')
+
+    def list(self, request, *args, **kwargs):
+        return self.get_feed_response(
+            super().list, (FEED_NAMESPACE,), request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        pk = kwargs[self.lookup_url_kwarg or self.lookup_field]
+        if not str(pk).isdigit():
+            return super().retrieve(request, *args, **kwargs)
+        return self.get_feed_response(
+            super().retrieve,
+            (get_recipe_namespace(pk), 'tags', 'ingredients'),
+            request, *args, **kwargs
+        )
+
+    def get_feed_cache_key(self, request, versions):
+        params = request.query_params
+        query = sorted(
+            (name, sorted(params.getlist(name)))
+            for name in self.feed_cache_params if params.get(name)
+        )
+        digest = hashlib.md5(json.dumps([
+            versions, request.build_absolute_uri(request.path), query,
+            request.accepted_media_type,
+        ]).encode()).hexdigest()
+        return f'{FEED_NAMESPACE}:{self.action}:{digest}'
+
+    def get_feed_response(self, handler, namespaces, request, *args,
+                          **kwargs):
+        params = request.query_params
+        if any(params.get(name) for name in self.feed_cache_bypass_params):
+            return handler(request, *args, **kwargs)
+
+        key = self.get_feed_cache_key(request, get_cache_versions(namespaces))
+        entry = cache.get(key)
+        data = None
+        if entry is not None:
+            data, authors = entry
+            if get_author_versions(get_payload_recipes(data)) != authors:
+                data = None
+        if data is None:
+            user = request.user
+            request.user = AnonymousUser()
+            try:
+                response = handler(request, *args, **kwargs)
+            finally:
+                request.user = user
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            data = json.loads(JSONRenderer().render(response.data))
+            # Read after rendering, an author saved in between is only
+            # picked up once the entry expires.
+            authors = get_author_versions(get_payload_recipes(data))
+            cache.set(key, (data, authors), settings.FEED_CACHE_TIMEOUT)
+
+        if not request.user.is_anonymous:
+            add_user_flags(data, request.user)
+        return Response(data)
@@ -1,14 +1,28 @@
 import base64
+import binascii
 
-from django.core.files.base import ContentFile
+from django.conf import settings
 from rest_framework import serializers
 
+from recipes.images import ImageError, process_upload
+
 
 class Base64ImageField(serializers.ImageField):
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')
-            ext = format.split('/')[-1]
-            data = ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
+            imgstr = data.partition(';base64,')[2]
+            # Reject oversized payloads before decoding them.
+            if len(imgstr) * 3 // 4 > settings.IMAGE_MAX_BYTES:
+                raise serializers.ValidationError(
+                    'Слишком большой файл изображения'
+                )
+            try:
+                data = process_upload(base64.b64decode(imgstr))
+            except binascii.Error:
+                raise serializers.ValidationError(
+                    'Некорректные данные изображения'
+                )
+            except ImageError as error:
+                raise serializers.ValidationError(str(error))
 
         return super().to_internal_value(data)
@@ -1,11 +1,14 @@
-from django.db.models import Q
+from django.db.models import Exists, OuterRef, Q
 from django_filters import rest_framework as django_filters
 from rest_framework import filters
 
-from recipes.models import Recipe, Tag
+from recipes.ingredient_index import ingredient_index
+from recipes.models import Recipe
 
 
 class IngredientSeatchFilter(filters.SearchFilter):
+    """Ingredient autocomplete served from the in-memory index."""
+
     search_param = 'name'
 
     def filter_queryset(self, request, queryset, view):
@@ -16,6 +19,11 @@ class IngredientSeatchFilter(filters.SearchFilter):
 
         lookup = search_terms[0]
 
+        if view.action == 'list':
+            return ingredient_index.search(
+                request.query_params[self.search_param]
+            )
+
         queryset = queryset.filter(
             Q(name__istartswith=lookup) | Q(name__icontains=lookup)
         )
@@ -23,11 +31,13 @@ class IngredientSeatchFilter(filters.SearchFilter):
 
 
 class RecipeFilter(django_filters.FilterSet):
-    tags = django_filters.ModelMultipleChoiceFilter(
-        field_name='tags__slug',
-        to_field_name='slug',
-        queryset=Tag.objects.all(),
+    TAGS_MODES = (('any', 'любой из тегов'), ('all', 'все теги'))
+
+    tags = django_filters.CharFilter(method='filter_tags')
+    tags_mode = django_filters.ChoiceFilter(
+        choices=TAGS_MODES, method='filter_tags_mode'
     )
+    search = django_filters.CharFilter(method='filter_search')
     is_favorited = django_filters.BooleanFilter(method='filter_is_favorited')
     is_in_shopping_cart = django_filters.BooleanFilter(
         method='filter_is_in_shopping_cart'
@@ -35,7 +45,37 @@ class RecipeFilter(django_filters.FilterSet):
 
     class Meta:
         model = Recipe
-        fields = ('is_favorited', 'is_in_shopping_cart', 'author', 'tags')
+        fields = (
+            'is_favorited', 'is_in_shopping_cart', 'author', 'tags',
+            'tags_mode', 'search',
+        )
+
+    def filter_search(self, queryset, name, value):
+        return queryset.search(value)
+
+    def filter_tags(self, queryset, name, value):
+        """Filter by ``?tags=slug&tags=slug`` with EXISTS subqueries.
+
+        Unlike a join on the M2M table this returns every recipe once and
+        needs no query to check the slugs.
+        """
+        slugs = set(self.data.getlist(name))
+        recipe_tags = Recipe.tags.through.objects.filter(
+            recipe=OuterRef('pk')
+        )
+        if self.data.get('tags_mode') == 'all':
+            for slug in slugs:
+                queryset = queryset.filter(
+                    Exists(recipe_tags.filter(tag__slug=slug))
+                )
+            return queryset
+        return queryset.filter(
+            Exists(recipe_tags.filter(tag__slug__in=slugs))
+        )
+
+    def filter_tags_mode(self, queryset, name, value):
+        # Applied by filter_tags.
+        return queryset
 
     def filter_is_favorited(self, queryset, name, value):
         if value is True:
@@ -0,0 +1,343 @@
+import http.client
+import json
+import subprocess
+import time
+from urllib.parse import quote, urlsplit
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from api.benchmarks import (SERVER_TIMING_QUERIES, format_summary, run_http,
+                            summarize)
+from api.middleware import get_query_budget
+from api.urls import router as api_router
+from recipes.models import (Favorite, Ingredient, IngredientAmount, Recipe,
+                            ShoppingCart, Tag)
+from users.models import Subscribtion
+from users.urls import router as users_router
+
+User = get_user_model()
+
+ROUTERS = (api_router, users_router)
+
+# Extra query strings benchmarked for list endpoints.
+QUERY_CASES = {
+    'recipes-list': (
+        '?is_favorited=1', '?is_in_shopping_cart=1', '?author={author}',
+        '?tags={tag}', '?page=10', '?pagination=cursor',
+    ),
+    'ingredients-list': ('?name=мук', '?name=а'),
+    'users-subscriptions': ('?recipes_limit=3',),
+    'recipes-download-shopping-cart': ('?format=csv', '?format=pdf'),
+    'recipes-pantry': ('?{pantry}',),
+}
+
+
+class TestClientDriver:
+    name = 'test-client'
+
+    def __init__(self, token):
+        self.client = Client(
+            HTTP_AUTHORIZATION=f'Token {token}', raise_request_exception=False
+        )
+
+    def request(self, method, path):
+        response = getattr(self.client, method)(path)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        metrics = getattr(response, 'metrics', None)
+        return response.status_code, metrics and metrics.query_count
+
+
+class HTTPDriver:
+    name = 'http'
+
+    def __init__(self, url, token):
+        self.url = url
+        self.target = urlsplit(url)
+        self.headers = {
+            'Accept': 'application/json', 'Authorization': f'Token {token}'
+        }
+        self.connection = None
+
+    def request(self, method, path):
+        if self.connection is None:
+            self.connection = http.client.HTTPConnection(
+                self.target.hostname, self.target.port or 80, timeout=30
+            )
+        try:
+            self.connection.request(
+                method.upper(), quote(path, safe='/?=&'), headers=self.headers
+            )
+            response = self.connection.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            self.connection.close()
+            self.connection = None
+            return 599, None
+        match = SERVER_TIMING_QUERIES.search(
+            response.getheader('Server-Timing', '')
+        )
+        return response.status, match and int(match.group(1))
+
+
+def get_commit():
+    try:
+        return subprocess.run(
+            ('git', 'rev-parse', '--short', 'HEAD'),
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный прогон всех эндпоинтов api.urls и users.urls: '
+        'p50/p95/p99, пропускная способность и число запросов к БД'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', help='Имя пользователя, от которого идут запросы'
+        )
+        parser.add_argument(
+            '--url', help='Адрес запущенного сервера, по умолчанию '
+            'запросы идут через тестовый клиент Django'
+        )
+        parser.add_argument('--requests', type=int, default=100)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument(
+            '--concurrency', type=int, default=1,
+            help='Параллельные GET-запросы, только вместе с --url'
+        )
+        parser.add_argument('--only', help='Подстрока имени эндпоинта')
+        parser.add_argument('--output', help='Сохранить результаты в JSON')
+        parser.add_argument(
+            '--compare', help='JSON предыдущего прогона для сравнения'
+        )
+        parser.add_argument(
+            '--threshold', type=float, default=10,
+            help='Допустимый рост p95, в процентах'
+        )
+
+    def handle(self, **options):
+        if options['requests'] < 1:
+            raise CommandError('--requests должен быть больше 0')
+        user = self.get_user(options['user'])
+        token, _ = Token.objects.get_or_create(user=user)
+        if options['url']:
+            driver = HTTPDriver(options['url'], token.key)
+        else:
+            driver = TestClientDriver(token.key)
+
+        cases, skipped = self.get_cases(user)
+        if options['only']:
+            cases = [case for case in cases if options['only'] in case[0]]
+
+        results = {}
+        for label, steps, budget in cases:
+            if (
+                options['url'] and options['concurrency'] > 1
+                and len(steps) == 1 and steps[0][0] == 'get'
+            ):
+                summary = self.run_concurrent(driver, steps[0][1], options)
+            else:
+                summary = self.run(driver, steps, options)
+            if budget is not None:
+                summary['query_budget'] = budget
+            results[label] = summary
+            line = format_summary(label, summary)
+            if summary.get('queries_max', 0) > (budget or float('inf')):
+                self.stdout.write(self.style.WARNING(
+                    f'{line}, бюджет {budget}'
+                ))
+            else:
+                self.stdout.write(line)
+        for label in skipped:
+            self.stdout.write(f'{label}: пропущен, изменяет данные')
+
+        report = {
+            'meta': {
+                'commit': get_commit(),
+                'date': timezone.now().isoformat(),
+                'driver': driver.name,
+                'database': connection.vendor,
+                'requests': options['requests'],
+                'concurrency': options['concurrency'],
+                'dataset': {
+                    model._meta.label: model.objects.count()
+                    for model in (User, Recipe, Ingredient, Tag, Favorite,
+                                  ShoppingCart, Subscribtion)
+                },
+            },
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w', encoding='UTF-8') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+        if options['compare']:
+            self.compare(options['compare'], results, options['threshold'])
+
+    def get_user(self, username):
+        users = User.objects.filter(is_active=True)
+        if username:
+            users = users.filter(username=username)
+        user = users.order_by('id').first()
+        if user is None:
+            raise CommandError(
+                'Нет пользователя для запросов, '
+                'сначала выполните generate_dataset'
+            )
+        return user
+
+    def get_samples(self, user):
+        recipe = Recipe.objects.exclude(author=user).exclude(
+            is_favorited__user=user
+        ).exclude(is_in_shopping_cart__user=user).order_by('id').first()
+        author = User.objects.exclude(id=user.id).exclude(
+            subscribing__user=user
+        ).order_by('-recipes_count', 'id').first()
+        if recipe is None or author is None:
+            raise CommandError(
+                'Недостаточно данных, сначала выполните generate_dataset'
+            )
+        return {
+            'recipes': recipe.pk,
+            'users': author.pk,
+            'tags': Tag.objects.order_by('id').values_list(
+                'id', flat=True
+            ).first(),
+            'ingredients': Ingredient.objects.order_by('id').values_list(
+                'id', flat=True
+            ).first(),
+            'author': author.pk,
+            'tag': Tag.objects.order_by('id').values_list(
+                'slug', flat=True
+            ).first(),
+            'pantry': '&'.join(
+                f'ingredients={pk}' for pk in IngredientAmount.objects.values(
+                    'ingredient'
+                ).annotate(
+                    uses=Count('id')
+                ).order_by('-uses').values_list('ingredient', flat=True)[:10]
+            ),
+        }
+
+    def get_cases(self, user):
+        """Benchmark cases as (label, [(method, path), ...], budget), the
+        budget of a case is the largest one of its actions.
+
+        Reads are requested as they are. Paired POST and DELETE actions
+        such as favorite or subscribe are requested in turn, so the data
+        is left unchanged. Other writes are skipped.
+        """
+        samples = self.get_samples(user)
+        cases = []
+        skipped = []
+        for router in ROUTERS:
+            for pattern in router.urls:
+                groups = pattern.pattern.regex.groupindex
+                actions = getattr(pattern.callback, 'actions', None)
+                if 'format' in groups or not actions:
+                    continue
+                kwargs = {}
+                if 'pk' in groups:
+                    basename = pattern.name.split('-')[0]
+                    kwargs['pk'] = samples[basename]
+                path = reverse(pattern.name, kwargs=kwargs)
+
+                toggle = 'post' in actions and 'delete' in actions and kwargs
+                if toggle:
+                    budgets = [
+                        get_query_budget(pattern.name, actions[method])
+                        for method in ('post', 'delete')
+                    ]
+                    cases.append((
+                        f'{pattern.name} POST+DELETE',
+                        [('post', path), ('delete', path)],
+                        None if None in budgets else max(budgets)
+                    ))
+                elif 'get' in actions:
+                    budget = get_query_budget(pattern.name, actions['get'])
+                    cases.append((pattern.name, [('get', path)], budget))
+                    cases += [
+                        (
+                            f'{pattern.name}{query}', [('get', path + query)],
+                            budget
+                        )
+                        for query in (
+                            query.format(**samples)
+                            for query in QUERY_CASES.get(pattern.name, ())
+                        )
+                    ]
+                skipped += [
+                    f'{pattern.name} {method.upper()}' for method in actions
+                    if method not in ('get', 'head', 'options')
+                    and not toggle
+                ]
+        return cases, skipped
+
+    def run(self, driver, steps, options):
+        for _ in range(options['warmup']):
+            for method, path in steps:
+                driver.request(method, path)
+
+        latencies = []
+        queries = []
+        errors = 0
+        started = time.perf_counter()
+        for _ in range(options['requests']):
+            for method, path in steps:
+                request_started = time.perf_counter()
+                status, query_count = driver.request(method, path)
+                latencies.append(time.perf_counter() - request_started)
+                if status >= 400:
+                    errors += 1
+                if query_count is not None:
+                    queries.append(query_count)
+        return summarize(
+            latencies, time.perf_counter() - started, errors, queries
+        )
+
+    def run_concurrent(self, driver, path, options):
+        run_http(driver.url, path, driver.headers, options['warmup'], 1)
+        return summarize(*run_http(
+            driver.url, path, driver.headers,
+            options['requests'], options['concurrency']
+        ))
+
+    def compare(self, path, results, threshold):
+        with open(path, encoding='UTF-8') as file:
+            previous = json.load(file)['results']
+        regressions = 0
+        for label, summary in results.items():
+            before = previous.get(label)
+            if before is None:
+                continue
+            change = (
+                (summary['p95_ms'] - before['p95_ms']) / before['p95_ms'] * 100
+                if before['p95_ms'] else 0.0
+            )
+            more_queries = (
+                summary.get('queries_max', 0) > before.get('queries_max', 0)
+            )
+            line = (
+                f"{label}: p95 {before['p95_ms']} -> {summary['p95_ms']} мс "
+                f"({change:+.1f}%), запросов к БД "
+                f"{before.get('queries_max')} -> {summary.get('queries_max')}"
+            )
+            if change > threshold or more_queries:
+                regressions += 1
+                self.stdout.write(self.style.ERROR(line))
+            else:
+                self.stdout.write(line)
+        if regressions:
+            raise CommandError(f'Регрессий: {regressions}')
+        self.stdout.write(self.style.SUCCESS('Регрессий нет'))
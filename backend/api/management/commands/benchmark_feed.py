@@ -0,0 +1,144 @@
+import json
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count
+from django.test.utils import override_settings
+
+from api.benchmarks import format_summary, summarize
+from recipes.feed import FEED_STRATEGIES, get_feed
+from recipes.models import Recipe
+
+User = get_user_model()
+
+# Readers are grouped by the number of followed authors.
+FOLLOW_BUCKETS = ((1, 5), (6, 20), (21, None))
+
+
+def bucket_label(bucket):
+    low, high = bucket
+    return f'{low}+' if high is None else f'{low}-{high}'
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнение стратегий ленты подписок (pull и push): чтение страниц '
+        'ленты по числу подписок и стоимость публикации рецепта'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--readers', type=int, default=30,
+            help='Читателей в каждой группе по числу подписок'
+        )
+        parser.add_argument('--pages', type=int, default=3,
+                            help='Сколько страниц ленты читать подряд')
+        parser.add_argument('--limit', type=int, default=6)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument(
+            '--authors', type=int, default=20,
+            help='Авторов для замера публикации, самые популярные'
+        )
+        parser.add_argument('--json', action='store_true')
+
+    def handle(self, **options):
+        if min(options['readers'], options['pages'], options['limit'],
+               options['repeat']) < 1:
+            raise CommandError(
+                '--readers, --pages, --limit и --repeat должны быть больше 0'
+            )
+        readers = self.get_readers(options['readers'])
+        if not readers:
+            raise CommandError(
+                'Нет подписок, сначала выполните generate_dataset'
+            )
+
+        results = {}
+        for name in FEED_STRATEGIES:
+            feed = get_feed(name)
+            started = time.perf_counter()
+            rows = feed.rebuild()
+            results[f'{name} rebuild'] = {
+                'rows': rows,
+                'seconds': round(time.perf_counter() - started, 2),
+            }
+            for bucket, users in readers.items():
+                results[f'{name} read {bucket}'] = self.read(
+                    feed, users, options
+                )
+            results[f'{name} publish'] = self.publish(feed, options)
+        # Leave the feed tables as the configured strategy expects them.
+        get_feed().rebuild()
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for label, summary in results.items():
+            if 'rps' in summary:
+                self.stdout.write(format_summary(label, summary))
+            else:
+                self.stdout.write(
+                    f"{label}: строк {summary['rows']}, "
+                    f"{summary['seconds']} с"
+                )
+
+    def get_readers(self, count):
+        users = User.objects.annotate(
+            followed=Count('subscriber')
+        ).filter(followed__gt=0).order_by('id')
+        readers = {}
+        for bucket in FOLLOW_BUCKETS:
+            low, high = bucket
+            selected = users.filter(followed__gte=low)
+            if high is not None:
+                selected = selected.filter(followed__lte=high)
+            selected = list(selected[:count])
+            if selected:
+                readers[bucket_label(bucket)] = selected
+        return readers
+
+    def read(self, feed, users, options):
+        """Read ``--pages`` keyset pages of the feed of every user."""
+        latencies = []
+        started = time.perf_counter()
+        for _ in range(options['repeat']):
+            for user in users:
+                request_started = time.perf_counter()
+                queryset = feed.get_queryset(user).order_by(
+                    '-feed_pub_date', '-id'
+                ).values_list('feed_pub_date', 'id')
+                page = list(queryset[:options['limit']])
+                for _ in range(options['pages'] - 1):
+                    if len(page) < options['limit']:
+                        break
+                    pub_date, pk = page[-1]
+                    page = list(queryset.filter(
+                        feed_pub_date__lte=pub_date
+                    ).exclude(
+                        feed_pub_date=pub_date, id__gte=pk
+                    )[:options['limit']])
+                latencies.append(time.perf_counter() - request_started)
+        return summarize(latencies, time.perf_counter() - started)
+
+    def publish(self, feed, options):
+        """Publish a recipe as popular authors, rolled back each time."""
+        authors = User.objects.order_by(
+            '-followers_count', 'id'
+        )[:options['authors']]
+        latencies = []
+        started = time.perf_counter()
+        for author in authors:
+            with transaction.atomic():
+                # Feed writes of the configured strategy are left out.
+                with override_settings(FEED_STRATEGY='pull'):
+                    recipe = Recipe.objects.create(
+                        author=author, name='benchmark', text='benchmark',
+                        cooking_time=1,
+                    )
+                publish_started = time.perf_counter()
+                feed.recipe_created(recipe)
+                latencies.append(time.perf_counter() - publish_started)
+                transaction.set_rollback(True)
+        return summarize(latencies, time.perf_counter() - started)
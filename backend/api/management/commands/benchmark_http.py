@@ -0,0 +1,83 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.benchmarks import (format_summary, process_tree_rss, run_http,
+                            summarize)
+
+DEFAULT_PATHS = (
+    '/api/recipes/',
+    '/api/recipes/{recipe}/',
+    '/api/tags/',
+    '/api/ingredients/?name=са',
+    '/api/users/me/',
+)
+
+
+def parse_pair(value):
+    label, _, rest = value.partition('=')
+    if not rest:
+        raise CommandError(f'Ожидается метка=значение: {value}')
+    return label, rest
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочное сравнение развёртываний (например, gunicorn и uvicorn): '
+        'запросов в секунду и p50/p95/p99 по каждому эндпоинту'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--target', action='append', required=True,
+            help='метка=http://host:port, можно указать несколько раз'
+        )
+        parser.add_argument(
+            '--pid', action='append', default=[],
+            help='метка=pid процесса сервера, для замера памяти (RSS)'
+        )
+        parser.add_argument(
+            '--path', action='append',
+            help='Путь запроса, по умолчанию горячие эндпоинты чтения'
+        )
+        parser.add_argument('--recipe', type=int, default=1)
+        parser.add_argument('--token', help='Токен для авторизованных путей')
+        parser.add_argument('--concurrency', type=int, default=32)
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument('--warmup', type=int, default=50)
+        parser.add_argument('--json', action='store_true')
+
+    def handle(self, **options):
+        if options['concurrency'] < 1 or options['requests'] < 1:
+            raise CommandError('--concurrency и --requests должны быть > 0')
+        pids = dict(parse_pair(value) for value in options['pid'])
+        paths = [
+            path.format(recipe=options['recipe'])
+            for path in options['path'] or DEFAULT_PATHS
+        ]
+        headers = {'Accept': 'application/json'}
+        if options['token']:
+            headers['Authorization'] = f"Token {options['token']}"
+
+        results = {}
+        for label, url in map(parse_pair, options['target']):
+            results[label] = {}
+            for path in paths:
+                run_http(url, path, headers, options['warmup'], 1)
+                summary = summarize(*run_http(
+                    url, path, headers,
+                    options['requests'], options['concurrency']
+                ))
+                if label in pids:
+                    summary['rss_mib'] = process_tree_rss(int(pids[label]))
+                results[label][path] = summary
+                if not options['json']:
+                    self.stdout.write(format_summary(
+                        f'{label} {path}', summary
+                    ))
+            if label in pids and not options['json']:
+                rss = process_tree_rss(int(pids[label]))
+                self.stdout.write(f'{label}: память сервера {rss} МиБ')
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, ensure_ascii=False))
@@ -0,0 +1,112 @@
+import re
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+current_metrics = ContextVar('current_metrics', default=None)
+
+IN_PARAMS = re.compile(r'IN \((?:%s, )*%s\)')
+NUMBERS = re.compile(r'\b\d+\b')
+SPACES = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    """SQL with literals and IN lists collapsed, equal for N+1 queries."""
+    sql = IN_PARAMS.sub('IN (...)', sql)
+    sql = NUMBERS.sub('?', sql)
+    return SPACES.sub(' ', sql).strip()
+
+
+class RequestMetrics:
+    """Queries and timings collected while one request is handled."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.query_count = 0
+        self.db_time = 0.0
+        self.fingerprints = Counter()
+        self.timings = defaultdict(float)
+
+    def add_query(self, sql, duration):
+        self.query_count += 1
+        self.db_time += duration
+        self.fingerprints[fingerprint(sql)] += 1
+
+    def duplicates(self):
+        return [
+            (sql, count) for sql, count in self.fingerprints.most_common()
+            if count > 1
+        ]
+
+    @contextmanager
+    def timer(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] += time.perf_counter() - started
+
+    def timed(self, name, func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with self.timer(name):
+                return func(*args, **kwargs)
+        return wrapper
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+
+def record_query(execute, sql, params, many, context):
+    """Database execute wrapper feeding the metrics of the current request.
+
+    Installed on every connection, so queries made in threads of
+    ``sync_to_async`` are counted too.
+    """
+    metrics = current_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.add_query(sql, time.perf_counter() - started)
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class RequestMetricsMixin:
+    """Times serialization and rendering of viewset responses.
+
+    Serialization time includes the queries the serializer makes.
+    """
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        metrics = current_metrics.get()
+        if metrics is not None:
+            serializer.to_representation = metrics.timed(
+                'serialize', serializer.to_representation
+            )
+        return serializer
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs
+        )
+        metrics = current_metrics.get()
+        if metrics is not None and hasattr(
+            response, 'add_post_render_callback'
+        ):
+            started = time.perf_counter()
+
+            def rendered(response):
+                metrics.timings['render'] += time.perf_counter() - started
+
+            response.add_post_render_callback(rendered)
+        return response
@@ -0,0 +1,113 @@
+import asyncio
+import json
+import logging
+
+from django.conf import settings
+
+from .metrics import RequestMetrics, current_metrics
+
+logger = logging.getLogger('api.metrics')
+
+
+def get_view_info(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return None, None
+    actions = getattr(match.func, 'actions', None) or {}
+    return match.view_name, actions.get(request.method.lower())
+
+
+def get_query_budget(view_name, action):
+    """Budget of the view from ``QUERY_BUDGETS``, either one for the whole
+    view or one per action."""
+    budget = settings.QUERY_BUDGETS.get(view_name)
+    if isinstance(budget, dict):
+        return budget.get(action)
+    return budget
+
+
+class RequestMetricsMiddleware:
+    """Collect per-request query count, DB time and timings.
+
+    Adds a ``Server-Timing`` header, writes one JSON log line per request
+    to the ``api.metrics`` logger and warns when the view action exceeds
+    its budget in ``QUERY_BUDGETS``. The collected metrics are also available
+    as ``response.metrics``.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Mark the instance as a coroutine function like Django's
+            # MiddlewareMixin does.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self.process_metrics(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self.process_metrics(request, response, metrics)
+
+    def process_metrics(self, request, response, metrics):
+        total = metrics.elapsed()
+        view_name, action = get_view_info(request)
+        size = None if response.streaming else len(response.content)
+        response.metrics = metrics
+
+        if settings.SERVER_TIMING_HEADER:
+            timings = [
+                f'db;dur={metrics.db_time * 1000:.1f};'
+                f'desc="{metrics.query_count} queries"'
+            ]
+            timings += [
+                f'{name};dur={duration * 1000:.1f}'
+                for name, duration in metrics.timings.items()
+            ]
+            timings.append(f'total;dur={total * 1000:.1f}')
+            response['Server-Timing'] = ', '.join(timings)
+
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'view': view_name,
+            'action': action,
+            'status': response.status_code,
+            'queries': metrics.query_count,
+            'db_ms': round(metrics.db_time * 1000, 2),
+            'total_ms': round(total * 1000, 2),
+            'response_bytes': size,
+        }
+        record.update(
+            (f'{name}_ms', round(duration * 1000, 2))
+            for name, duration in metrics.timings.items()
+        )
+        duplicates = metrics.duplicates()
+        if duplicates:
+            record['duplicate_queries'] = [
+                {'sql': sql, 'count': count} for sql, count in duplicates
+            ]
+        logger.info(json.dumps(record, ensure_ascii=False))
+
+        budget = get_query_budget(view_name, action)
+        if budget is not None and metrics.query_count > budget:
+            logger.warning(json.dumps(
+                dict(record, query_budget=budget), ensure_ascii=False
+            ))
+        return response
@@ -0,0 +1,9 @@
+from rest_framework.negotiation import DefaultContentNegotiation
+
+
+class IgnoreFormatContentNegotiation(DefaultContentNegotiation):
+    """Leave the ``format`` query parameter to the view instead of
+    matching it against the renderers."""
+
+    def filter_renderers(self, renderers, format):
+        return renderers
@@ -1,4 +1,11 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+from collections import OrderedDict
+
+from django.db import connections
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (Cursor, CursorPagination,
+                                       PageNumberPagination)
 from rest_framework.response import Response
 
 
@@ -9,3 +16,132 @@ class ResponseOnlyPagination(PageNumberPagination):
 
 class RecipesPagination(PageNumberPagination):
     page_size_query_param = 'limit'
+
+
+def estimate_count(queryset):
+    """Planner row estimate on PostgreSQL, None elsewhere."""
+    queryset = queryset.order_by()
+    if connections[queryset.db].vendor != 'postgresql':
+        return None
+    plan = json.loads(queryset.explain(format='json'))
+    return plan[0]['Plan']['Plan Rows']
+
+
+class KeysetCursorPagination(CursorPagination):
+    """Cursor pagination that seeks by the whole ``(date, id)`` ordering.
+
+    DRF keeps only the first ordering field in the cursor and skips rows
+    with the same date by OFFSET. Here the cursor holds both fields of the
+    edge row and the next page is ``date <= D`` without ``date = D AND
+    id >= I``, so a page costs the same wherever it is. Both ordering
+    fields must be descending.
+    """
+
+    page_size_query_param = 'limit'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+        self.base_url = request.build_absolute_uri()
+        self.cursor = self.decode_cursor(request)
+        self.reverse = self.cursor is not None and self.cursor.reverse
+        date_field, id_field = (
+            field.lstrip('-') for field in self.ordering
+        )
+
+        if self.reverse:
+            queryset = queryset.order_by(date_field, id_field)
+        else:
+            queryset = queryset.order_by(*self.ordering)
+        if self.cursor is not None and self.cursor.position is not None:
+            date, pk = self.parse_position(self.cursor.position)
+            if self.reverse:
+                queryset = queryset.filter(**{
+                    f'{date_field}__gte': date
+                }).exclude(**{date_field: date, f'{id_field}__lte': pk})
+            else:
+                queryset = queryset.filter(**{
+                    f'{date_field}__lte': date
+                }).exclude(**{date_field: date, f'{id_field}__gte': pk})
+
+        results = list(queryset[:self.page_size + 1])
+        self.has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        if self.reverse:
+            self.page.reverse()
+        self.display_page_controls = True
+        return self.page
+
+    def get_position(self, instance):
+        date, pk = (
+            getattr(instance, field.lstrip('-')) for field in self.ordering
+        )
+        return f'{date.isoformat()}|{pk}'
+
+    def parse_position(self, position):
+        try:
+            date, pk = position.split('|')
+            date = parse_datetime(date)
+            pk = int(pk)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if date is None:
+            raise NotFound(self.invalid_cursor_message)
+        return date, pk
+
+    def get_link(self, reverse, instance):
+        if instance is None:
+            position = self.cursor.position
+        else:
+            position = self.get_position(instance)
+        return self.encode_cursor(
+            Cursor(offset=0, reverse=reverse, position=position)
+        )
+
+    def get_next_link(self):
+        # A page reached backwards always has the one it came from after it.
+        if not (self.reverse or self.has_more):
+            return None
+        return self.get_link(False, self.page[-1] if self.page else None)
+
+    def get_previous_link(self):
+        if self.reverse:
+            has_previous = self.has_more
+        else:
+            has_previous = self.cursor is not None
+        if not has_previous:
+            return None
+        return self.get_link(True, self.page[0] if self.page else None)
+
+
+class RecipesCursorPagination(KeysetCursorPagination):
+    """Keyset pagination over ``(pub_date, id)`` without COUNT and OFFSET.
+
+    Enabled with ``?pagination=cursor``; ``?count=estimate`` adds the
+    planner's estimate of the total on PostgreSQL, ``count`` stays null on
+    other databases.
+    """
+
+    ordering = ('-pub_date', '-id')
+    count_query_param = 'count'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count = None
+        if request.query_params.get(self.count_query_param) == 'estimate':
+            self.count = estimate_count(queryset)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('count', self.count),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data)
+        ]))
+
+
+class FeedCursorPagination(KeysetCursorPagination):
+    """Keyset pagination of the subscription feed, newest first."""
+
+    ordering = ('-feed_pub_date', '-id')
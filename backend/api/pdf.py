@@ -0,0 +1,103 @@
+import hashlib
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import cache
+from fpdf import FPDF, set_global
+
+FONT_FAMILY = 'DejaVu'
+FONT_PATH = settings.BASE_DIR / 'fonts' / 'DejaVuSansCondensed.ttf'
+
+# Font metrics are kept in memory by get_font(), no need for .pkl files.
+set_global('FPDF_CACHE_MODE', 1)
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.PDF_RENDER_WORKERS,
+    thread_name_prefix='pdf-render'
+)
+in_progress = {}
+in_progress_lock = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def get_font():
+    """Parse the TTF font once per process."""
+    pdf = FPDF()
+    pdf.add_font(FONT_FAMILY, '', str(FONT_PATH), uni=True)
+    return pdf.fonts[FONT_FAMILY.lower()], dict(pdf.font_files)
+
+
+class ShoppingListPDF(FPDF):
+    """FPDF document that reuses the font metrics parsed by get_font()."""
+
+    def add_font(self, family, style='', fname='', uni=False):
+        font, font_files = get_font()
+        self.fonts[font['fontkey']] = dict(
+            font, i=len(self.fonts) + 1, subset=list(font['subset'])
+        )
+        self.font_files.update(
+            (name, dict(info)) for name, info in font_files.items()
+        )
+
+
+def render_pdf(rows):
+    pdf = ShoppingListPDF('P', 'mm', 'A4')
+    pdf.add_page()
+    pdf.add_font(FONT_FAMILY, '', uni=True)
+    pdf.set_font(FONT_FAMILY, '', 14)
+    pdf.cell(40, 10, 'Ваш список покупок', 0, 1)
+    pdf.cell(40, 10, '', 0, 1)
+    pdf.cell(
+        200, 8, f"{'Ингредиент'.ljust(30)} {'Количество'.rjust(20)}", 0, 1
+    )
+    pdf.line(10, 30, 150, 30)
+    pdf.line(10, 38, 150, 38)
+    for name, measurement_unit, amount in rows:
+        amount_string = f'{amount} {measurement_unit}'
+        pdf.cell(200, 9, f'{name.ljust(30)} {amount_string.rjust(20)}', 0, 1)
+
+    # fpdf keeps binary data in a latin-1 str.
+    return pdf.output(dest='S').encode('latin-1')
+
+
+def get_cache_key(user, rows):
+    """Cache key of the user's list, versioned by the list content."""
+    version = hashlib.sha1(
+        json.dumps(rows, ensure_ascii=False).encode()
+    ).hexdigest()
+    return f'shopping_cart_pdf:{user.id}:{version}'
+
+
+def render_and_cache(key, rows):
+    try:
+        content = render_pdf(rows)
+        cache.set(key, content, settings.PDF_CACHE_TIMEOUT)
+        return content
+    finally:
+        with in_progress_lock:
+            in_progress.pop(key, None)
+
+
+def get_shopping_list_pdf(user, rows):
+    """Return the rendered PDF of the user's shopping list.
+
+    Renders run in a bounded thread pool, concurrent requests for the same
+    list share one render. Raises ``concurrent.futures.TimeoutError`` if
+    the render takes longer than ``PDF_RENDER_TIMEOUT`` seconds; the render
+    still completes and fills the cache for the next request.
+    """
+    key = get_cache_key(user, rows)
+    content = cache.get(key)
+    if content is not None:
+        return content
+
+    with in_progress_lock:
+        future = in_progress.get(key)
+        if future is None:
+            future = executor.submit(render_and_cache, key, rows)
+            in_progress[key] = future
+
+    return future.result(timeout=settings.PDF_RENDER_TIMEOUT)
@@ -1,9 +1,14 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from rest_framework import serializers
 
+from recipes.images import thumbnail_url
 from recipes.models import (Favorite, Ingredient, IngredientAmount,
                             Recipe, ShoppingCart, Tag)
-from users.serializers import UserSerializer
+from recipes.search import schedule_search_update
+from recipes.shopping_list import schedule_cart_refresh
+from users.serializers import ShortRecipeSerializer, UserSerializer
 
 from .fields import Base64ImageField
 
@@ -51,7 +56,7 @@ class IngredientAmountSerializer(serializers.ModelSerializer):
 class AddIngredientAmountSerializer(serializers.ModelSerializer):
     """Adding Ingredient and its Amount to the Recipe."""
 
-    id = serializers.PrimaryKeyRelatedField(queryset=Ingredient.objects.all())
+    id = serializers.IntegerField()
     amount = serializers.IntegerField(min_value=1, max_value=10000)
 
     class Meta:
@@ -75,33 +80,59 @@ class RecipeListSerializer(serializers.ModelSerializer):
     ingredients = serializers.SerializerMethodField(read_only=True)
     is_favorited = serializers.SerializerMethodField(read_only=True)
     is_in_shopping_cart = serializers.SerializerMethodField(read_only=True)
+    image = serializers.SerializerMethodField(read_only=True)
+    image_webp = serializers.SerializerMethodField(read_only=True)
 
     class Meta:
         model = Recipe
         fields = (
             'id', 'tags', 'author', 'ingredients', 'is_favorited',
-            'is_in_shopping_cart', 'name', 'image', 'text', 'cooking_time'
+            'is_in_shopping_cart', 'name', 'image', 'image_webp', 'text',
+            'cooking_time'
         )
-        read_only_fields = ('image',)
+
+    def get_image_url(self, obj, extension=None):
+        if not obj.image:
+            return None
+        if not obj.thumbnails_ready:
+            url = obj.image.url if extension is None else None
+        else:
+            # Lists show small cards, a single recipe the detail size.
+            size = 'detail'
+            if isinstance(self.parent, serializers.ListSerializer):
+                size = 'card'
+            url = thumbnail_url(obj.image.name, size, extension)
+        request = self.context.get('request')
+        if url is not None and request is not None:
+            url = request.build_absolute_uri(url)
+        return url
+
+    def get_image(self, obj):
+        return self.get_image_url(obj)
+
+    def get_image_webp(self, obj):
+        return self.get_image_url(obj, 'webp')
 
     def get_ingredients(self, obj):
         return IngredientAmountSerializer(
-            IngredientAmount.objects.filter(recipe=obj), many=True
+            obj.recipe.all(), many=True
         ).data
 
     def get_is_favorited(self, obj):
         user = self.context['request'].user
-        recipe = obj
         if user.is_anonymous:
             return False
-        return Favorite.objects.filter(user=user, recipe=recipe).exists()
+        if hasattr(obj, 'favorited_by_user'):
+            return obj.favorited_by_user
+        return Favorite.objects.filter(user=user, recipe=obj).exists()
 
     def get_is_in_shopping_cart(self, obj):
         user = self.context['request'].user
-        recipe = obj
         if user.is_anonymous:
             return False
-        return ShoppingCart.objects.filter(user=user, recipe=recipe).exists()
+        if hasattr(obj, 'in_user_shopping_cart'):
+            return obj.in_user_shopping_cart
+        return ShoppingCart.objects.filter(user=user, recipe=obj).exists()
 
 
 class RecipeSerializer(serializers.ModelSerializer):
@@ -121,16 +152,6 @@ class RecipeSerializer(serializers.ModelSerializer):
         )
         read_only_fields = ('author',)
 
-    def create_ingredients(self, recipe, ingredients):
-        for ingredient in ingredients:
-            ingredient_pk = ingredient['id']
-            ingredient_amount = ingredient['amount']
-            IngredientAmount.objects.create(
-                ingredient=ingredient_pk,
-                recipe=recipe,
-                amount=ingredient_amount
-            )
-
     def validate(self, attrs):
         if attrs['cooking_time'] < 1:
             raise serializers.ValidationError(
@@ -139,10 +160,76 @@ class RecipeSerializer(serializers.ModelSerializer):
 
         return attrs
 
-    def add_tags(self, recipe, tags):
-        for tag in tags:
-            recipe.tags.add(tag)
+    def validate_ingredients(self, value):
+        ingredients = [item['id'] for item in value]
+        if len(ingredients) != len(set(ingredients)):
+            raise serializers.ValidationError(
+                'Ингредиенты не должны повторяться'
+            )
+
+        missing = set(ingredients).difference(
+            Ingredient.objects.filter(
+                id__in=ingredients
+            ).values_list('id', flat=True)
+        )
+        if missing:
+            raise serializers.ValidationError(
+                f'Ингредиенты не существуют: {sorted(missing)}'
+            )
+
+        return value
 
+    def create_ingredients(self, recipe, ingredients):
+        IngredientAmount.objects.bulk_create(
+            IngredientAmount(
+                ingredient_id=ingredient['id'],
+                recipe=recipe,
+                amount=ingredient['amount']
+            )
+            for ingredient in ingredients
+        )
+        # bulk_create sends no signals.
+        schedule_search_update((recipe.id,))
+
+    def update_ingredients(self, recipe, ingredients):
+        """Write only the ingredient rows that differ from the stored ones."""
+        amounts = {
+            ingredient['id']: ingredient['amount']
+            for ingredient in ingredients
+        }
+        current = {
+            obj.ingredient_id: obj
+            for obj in IngredientAmount.objects.filter(recipe=recipe)
+        }
+
+        removed = current.keys() - amounts.keys()
+        if removed:
+            IngredientAmount.objects.filter(
+                recipe=recipe, ingredient__in=removed
+            ).delete()
+        changed = []
+        for ingredient_id, amount in amounts.items():
+            obj = current.get(ingredient_id)
+            if obj is not None and obj.amount != amount:
+                obj.amount = amount
+                changed.append(obj)
+        if changed:
+            IngredientAmount.objects.bulk_update(changed, ('amount',))
+
+        added = [
+            IngredientAmount(
+                ingredient_id=ingredient_id, recipe=recipe, amount=amount
+            )
+            for ingredient_id, amount in amounts.items()
+            if ingredient_id not in current
+        ]
+        if added:
+            IngredientAmount.objects.bulk_create(added)
+        # bulk_update and bulk_create send no signals.
+        schedule_cart_refresh((recipe.id,))
+        schedule_search_update((recipe.id,))
+
+    @transaction.atomic
     def create(self, validated_data):
         author = self.context['request'].user
         ingredients = validated_data.pop('ingredients')
@@ -152,48 +239,60 @@ class RecipeSerializer(serializers.ModelSerializer):
             **validated_data
         )
         self.create_ingredients(recipe, ingredients)
-        self.add_tags(recipe, tags)
+        recipe.tags.set(tags)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
-        instance.tags.clear()
-        IngredientAmount.objects.filter(recipe=instance).delete()
-        self.add_tags(instance, validated_data.pop('tags'))
-        self.create_ingredients(instance, validated_data.pop('ingredients'))
+        if 'image' in validated_data:
+            validated_data['thumbnails_ready'] = False
+        tags = validated_data.pop('tags', None)
+        if tags is not None:
+            instance.tags.set(tags)
+        ingredients = validated_data.pop('ingredients', None)
+        if ingredients is not None:
+            self.update_ingredients(instance, ingredients)
         return super().update(instance, validated_data)
 
 
-class FavoriteSerializer(serializers.ModelSerializer):
-    """Favorite Serializer."""
+class RecipeIdsSerializer(serializers.Serializer):
+    """Recipe ids of a batch favorite or shopping cart request."""
 
-    class Meta:
-        model = Favorite
-        fields = ('user', 'recipe')
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.RECIPES_BATCH_MAX,
+    )
 
-    def validate(self, attrs):
-        user = attrs['user']
-        recipe = attrs['recipe']
-        if Favorite.objects.filter(user=user, recipe=recipe).exists():
-            raise serializers.ValidationError(
-                'Вы уже добавили данный рецепт в избранное'
-            )
 
-        return attrs
+class SimilarRecipeSerializer(ShortRecipeSerializer):
+    """Short recipe description with its similarity score."""
 
+    score = serializers.FloatField(source='similarity', read_only=True)
 
-class ShoppingCartSerializer(serializers.ModelSerializer):
-    """Shopping Cart Serializer."""
+    class Meta(ShortRecipeSerializer.Meta):
+        fields = ShortRecipeSerializer.Meta.fields + ('score',)
 
-    class Meta:
-        model = ShoppingCart
-        fields = ('user', 'recipe')
 
-    def validate(self, attrs):
-        user = attrs['user']
-        recipe = attrs['recipe']
-        if ShoppingCart.objects.filter(user=user, recipe=recipe).exists():
-            raise serializers.ValidationError(
-                'Вы уже добавили данный рецепт в корзину'
-            )
+class PantrySerializer(serializers.Serializer):
+    """Ingredient ids of a "what can I cook" request."""
 
-        return attrs
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        required=False,
+        max_length=settings.PANTRY_INGREDIENTS_MAX,
+    )
+
+
+class PantryRecipeSerializer(ShortRecipeSerializer):
+    """Short recipe description with the ingredients missing at home."""
+
+    coverage = serializers.FloatField(read_only=True)
+    missing_ingredients = IngredientAmountSerializer(
+        many=True, read_only=True
+    )
+
+    class Meta(ShortRecipeSerializer.Meta):
+        fields = ShortRecipeSerializer.Meta.fields + (
+            'coverage', 'missing_ingredients'
+        )
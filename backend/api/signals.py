@@ -0,0 +1,90 @@
+from django.contrib.auth import get_user_model
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from recipes.models import Ingredient, IngredientAmount, Recipe, Tag
+from recipes.signals import recipes_updated
+from users.signals import get_changed_fields
+
+from .authentication import invalidate_tokens
+from .cache import (bump_cache_version, invalidate_author,
+                    invalidate_recipe_feed)
+from .metrics import install_query_recorder
+
+User = get_user_model()
+
+AUTHOR_FIELDS = ('username', 'email', 'first_name', 'last_name')
+TOKEN_FIELDS = ('password', 'is_active')
+
+connection_created.connect(install_query_recorder)
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def invalidate_tags_cache(sender, **kwargs):
+    bump_cache_version('tags')
+    invalidate_recipe_feed()
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_ingredients_cache(sender, **kwargs):
+    bump_cache_version('ingredients')
+    invalidate_recipe_feed()
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def invalidate_recipe_cache(sender, instance, **kwargs):
+    invalidate_recipe_feed((instance.pk,))
+
+
+@receiver((post_save, post_delete), sender=IngredientAmount)
+def invalidate_recipe_ingredients_cache(sender, instance, **kwargs):
+    invalidate_recipe_feed((instance.recipe_id,))
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_recipe_tags_cache(sender, instance, action, reverse, pk_set,
+                                 **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        invalidate_recipe_feed((instance.pk,))
+    elif pk_set:
+        invalidate_recipe_feed(pk_set)
+    else:
+        # A tag was cleared from all of its recipes.
+        bump_cache_version('tags')
+        invalidate_recipe_feed()
+
+
+@receiver(recipes_updated)
+def invalidate_updated_recipes_cache(sender, recipe_ids, **kwargs):
+    invalidate_recipe_feed(recipe_ids)
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_cache(sender, instance, created, using, **kwargs):
+    # Only the fields recipes embed of their author matter.
+    if created or not get_changed_fields(instance, AUTHOR_FIELDS):
+        return
+    invalidate_author(instance.pk, using)
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, using, **kwargs):
+    # Logout deletes the token, so does deleting its user.
+    invalidate_tokens((instance.key,), using)
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_tokens(sender, instance, created, using, **kwargs):
+    # The cached user must not outlive a password change or a block.
+    if created or not get_changed_fields(instance, TOKEN_FIELDS):
+        return
+    invalidate_tokens(
+        Token.objects.using(using).filter(
+            user=instance
+        ).values_list('key', flat=True),
+        using
+    )
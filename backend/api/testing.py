@@ -0,0 +1,53 @@
+from collections import Counter
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+
+from .metrics import fingerprint
+from .middleware import get_query_budget, get_view_info
+
+
+def format_queries(fingerprints):
+    return '\n'.join(
+        f'  {count} x {sql}' for sql, count in fingerprints
+    )
+
+
+class QueryBudgetMixin:
+    """Assertions on the number of queries made by API requests.
+
+    Use with Django's ``TestCase``, requests must go through
+    ``RequestMetricsMiddleware``::
+
+        response = self.client.get('/api/recipes/')
+        self.assertQueryBudget(response)
+    """
+
+    def assertQueryBudget(self, response, budget=None):
+        metrics = response.metrics
+        view_name, action = get_view_info(response.wsgi_request)
+        if budget is None:
+            budget = get_query_budget(view_name, action)
+        if budget is None:
+            self.fail(f'{view_name}: нет бюджета для действия {action}')
+        if metrics.query_count > budget:
+            self.fail(
+                f'{view_name} {action}: {metrics.query_count} запросов к БД, '
+                f'бюджет {budget}\n'
+                + format_queries(metrics.fingerprints.most_common())
+            )
+
+    @contextmanager
+    def assertMaxQueries(self, budget, using=DEFAULT_DB_ALIAS):
+        """Like ``assertNumQueries``, but fails only above the budget."""
+        with CaptureQueriesContext(connections[using]) as context:
+            yield context
+        if len(context) > budget:
+            self.fail(
+                f'{len(context)} запросов к БД, бюджет {budget}\n'
+                + format_queries(Counter(
+                    fingerprint(query['sql'])
+                    for query in context.captured_queries
+                ).most_common())
+            )
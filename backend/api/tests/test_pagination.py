@@ -0,0 +1,76 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from recipes.models import Recipe
+
+User = get_user_model()
+
+
+class RecipesCursorPaginationTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            email='author@example.com', username='author',
+            first_name='Автор', last_name='Рецептов', password='pass12345word'
+        )
+        now = timezone.now()
+        for i in range(23):
+            recipe = Recipe.objects.create(
+                author=author, name=f'рецепт {i}', text='описание',
+                cooking_time=10
+            )
+            # Groups of recipes published at the same moment.
+            Recipe.objects.filter(pk=recipe.pk).update(
+                pub_date=now - timezone.timedelta(minutes=i // 5)
+            )
+        cls.expected = list(Recipe.objects.order_by(
+            '-pub_date', '-id'
+        ).values_list('id', flat=True))
+
+    def setUp(self):
+        cache.clear()
+
+    def get_page(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(any(
+            'OFFSET' in sql for sql in response.metrics.fingerprints
+        ))
+        return response.data
+
+    def test_pages_with_equal_dates(self):
+        url = '/api/recipes/?pagination=cursor&limit=4'
+        seen = []
+        pages = []
+        while url:
+            with self.assertNumQueries(3):
+                data = self.get_page(url)
+            pages.append([recipe['id'] for recipe in data['results']])
+            seen += pages[-1]
+            previous, url = data['previous'], data['next']
+        self.assertEqual(seen, self.expected)
+
+        seen = []
+        while previous:
+            data = self.get_page(previous)
+            seen = [recipe['id'] for recipe in data['results']] + seen
+            previous = data['previous']
+        self.assertEqual(seen, self.expected[:-len(pages[-1])])
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/recipes/?cursor=cD0x')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_count_estimate(self):
+        data = self.get_page(
+            '/api/recipes/?pagination=cursor&count=estimate'
+        )
+        if connection.vendor == 'postgresql':
+            self.assertIsInstance(data['count'], int)
+        else:
+            self.assertIsNone(data['count'])
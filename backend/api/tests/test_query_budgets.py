@@ -0,0 +1,103 @@
+import base64
+import io
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import override_settings
+from PIL import Image
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from api.authentication import token_cache
+from api.testing import QueryBudgetMixin
+from recipes.models import Ingredient, Tag
+
+User = get_user_model()
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def get_image():
+    buffer = io.BytesIO()
+    Image.new('RGB', (4, 4)).save(buffer, 'PNG')
+    return (
+        'data:image/png;base64,'
+        + base64.b64encode(buffer.getvalue()).decode()
+    )
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class RecipeQueryBudgetTests(QueryBudgetMixin, APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            email='author@example.com', username='author',
+            first_name='Автор', last_name='Рецептов', password='pass12345word'
+        )
+        cls.token = Token.objects.create(user=cls.author)
+        cls.tags = [
+            Tag.objects.create(name=f'тег {i}', color='#FFFFFF', slug=f't{i}')
+            for i in range(2)
+        ]
+        cls.ingredients = [
+            Ingredient.objects.create(
+                name=f'ингредиент {i}', measurement_unit='г'
+            )
+            for i in range(5)
+        ]
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        token_cache.clear()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def get_recipe_data(self, **data):
+        return dict({
+            'name': 'Рецепт',
+            'text': 'Описание',
+            'cooking_time': 10,
+            'image': get_image(),
+            'tags': [tag.id for tag in self.tags],
+            'ingredients': [
+                {'id': ingredient.id, 'amount': amount}
+                for amount, ingredient in enumerate(self.ingredients, 1)
+            ],
+        }, **data)
+
+    def test_recipe_writes(self):
+        response = self.client.post(
+            '/api/recipes/', self.get_recipe_data(), format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertQueryBudget(response)
+        url = f'/api/recipes/{response.data["id"]}/'
+
+        response = self.client.patch(
+            url, self.get_recipe_data(name='Другой рецепт'), format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertQueryBudget(response)
+
+        response = self.client.delete(url)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertQueryBudget(response)
+
+    def test_recipe_reads(self):
+        response = self.client.post(
+            '/api/recipes/', self.get_recipe_data(), format='json'
+        )
+        url = f'/api/recipes/{response.data["id"]}/'
+        for path in ('/api/recipes/', url, '/api/tags/', '/api/ingredients/'):
+            with self.subTest(path=path):
+                response = self.client.get(path)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertQueryBudget(response)
@@ -0,0 +1,112 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from api.authentication import token_cache
+from api.cache import FEED_NAMESPACE, bump_cache_version
+from recipes.models import (Favorite, Ingredient, IngredientAmount, Recipe,
+                            ShoppingCart, Tag)
+from users.models import Subscribtion
+
+User = get_user_model()
+
+PAGE_SIZES = (6, 50, 200)
+
+
+class RecipeListQueriesTests(APITestCase):
+    """The number of queries of a recipe page does not depend on its size."""
+
+    @classmethod
+    def setUpTestData(cls):
+        authors = [
+            User.objects.create_user(
+                email=f'author{i}@example.com', username=f'author{i}',
+                first_name='Автор', last_name=str(i), password='pass12345word'
+            )
+            for i in range(5)
+        ]
+        cls.user = User.objects.create_user(
+            email='user@example.com', username='user',
+            first_name='Читатель', last_name='Рецептов',
+            password='pass12345word'
+        )
+        cls.token = Token.objects.create(user=cls.user)
+        tags = [
+            Tag.objects.create(name=f'тег {i}', color='#FFFFFF', slug=f't{i}')
+            for i in range(3)
+        ]
+        ingredients = [
+            Ingredient.objects.create(
+                name=f'ингредиент {i}', measurement_unit='г'
+            )
+            for i in range(10)
+        ]
+        for i in range(max(PAGE_SIZES)):
+            recipe = Recipe.objects.create(
+                author=authors[i % len(authors)], name=f'рецепт {i}',
+                text='описание', cooking_time=10
+            )
+            recipe.tags.set(tags[:i % len(tags) + 1])
+            IngredientAmount.objects.bulk_create(
+                IngredientAmount(
+                    recipe=recipe,
+                    ingredient=ingredients[(i + j) % len(ingredients)],
+                    amount=j + 1
+                )
+                for j in range(3)
+            )
+            if i % 2:
+                Favorite.objects.create(user=cls.user, recipe=recipe)
+            if i % 3 == 0:
+                ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+        Subscribtion.objects.create(user=cls.user, author=authors[0])
+
+    def setUp(self):
+        cache.clear()
+        token_cache.clear()
+
+    def assertPageQueries(self, num, limit, query=''):
+        # Every request renders the page, not the cached copy.
+        bump_cache_version(FEED_NAMESPACE)
+        with self.assertNumQueries(num):
+            response = self.client.get(f'/api/recipes/?limit={limit}{query}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        if not query:
+            self.assertEqual(len(response.data['results']), limit)
+        return response
+
+    def test_anonymous(self):
+        for limit in PAGE_SIZES:
+            with self.subTest(limit=limit):
+                self.assertPageQueries(4, limit)
+
+    def test_authenticated(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        for limit in PAGE_SIZES:
+            with self.subTest(limit=limit):
+                # The first request also looks the token up.
+                cache.clear()
+                token_cache.clear()
+                response = self.assertPageQueries(6, limit)
+                self.assertPageQueries(5, limit)
+                self.assertPageQueries(5, limit, '&is_favorited=1')
+
+        recipes = {recipe['id']: recipe for recipe in response.data['results']}
+        favorites = set(Favorite.objects.filter(
+            user=self.user
+        ).values_list('recipe', flat=True))
+        self.assertEqual(
+            {pk for pk, recipe in recipes.items() if recipe['is_favorited']},
+            favorites & set(recipes)
+        )
+
+    def test_cached_pages(self):
+        self.client.get('/api/recipes/?limit=50')
+        with self.assertNumQueries(0):
+            self.client.get('/api/recipes/?limit=50')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.client.get('/api/recipes/?limit=50')
+        with self.assertNumQueries(1):
+            self.client.get('/api/recipes/?limit=50')
@@ -1,100 +1,204 @@
-from django.http import FileResponse, HttpResponse
-from django.shortcuts import get_object_or_404
-from fpdf import FPDF
+import csv
+import json
+from collections import defaultdict
+from concurrent import futures
+
+from django.conf import settings
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from rest_framework import status
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 
-from recipes.models import IngredientAmount, Recipe
-from backend.settings import BASE_DIR
+from recipes.models import (Favorite, IngredientAmount, Recipe, ShoppingCart,
+                            ShoppingListItem)
 
+from .pdf import get_shopping_list_pdf
+from .serializers import RecipeIdsSerializer
+
+
+ALREADY_ADDED = {
+    Favorite: 'Вы уже добавили данный рецепт в избранное',
+    ShoppingCart: 'Вы уже добавили данный рецепт в корзину',
+}
 
-def execute_cart_favorite(request, pk, serializer, model):
-    if request.method == 'POST':
-        data = {'user': request.user.id, 'recipe': pk}
-        serializer = serializer(data=data, context={'request': request})
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
 
-        return Response(serializer.data, status=status.HTTP_200_OK)
+def execute_cart_favorite(request, pk, model):
+    """Add a recipe to the user's favorites or cart, or remove it.
 
-    user = request.user
-    recipe = get_object_or_404(Recipe, id=pk)
-    obj = get_object_or_404(model, user=user, recipe=recipe)
-    obj.delete()
+    Both directions take a single statement, the recipe is only looked
+    up again to explain why nothing was added.
+    """
+    try:
+        recipe_id = int(pk)
+    except ValueError:
+        recipe_id = None
 
+    if request.method == 'POST':
+        if recipe_id is not None and model.objects.add(
+            request.user, (recipe_id,)
+        ):
+            return Response(
+                {'user': request.user.id, 'recipe': recipe_id},
+                status=status.HTTP_200_OK
+            )
+        if recipe_id is None or not Recipe.objects.filter(
+            id=recipe_id
+        ).exists():
+            raise ValidationError(
+                {'recipe': [f'Рецепт {pk} не существует']}
+            )
+        raise ValidationError(
+            {api_settings.NON_FIELD_ERRORS_KEY: [ALREADY_ADDED[model]]}
+        )
+
+    if recipe_id is None or not model.objects.remove(
+        request.user, (recipe_id,)
+    ):
+        raise Http404
     return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-def create_pdf_file(request):
-    objects = IngredientAmount.objects.filter(
-        recipe__is_in_shopping_cart__user=request.user
-    )
-    product_list = {}
-    for obj in objects:
-        name = obj.ingredient.name
-        amount = obj.amount
-        measurement_unit = obj.ingredient.measurement_unit
-        if name in product_list:
-            product_list[name]['amount'] += amount
-        else:
-            product_list[name] = {
-                'measurement_unit': measurement_unit,
-                'amount': amount
-            }
-
-    pdf = FPDF('P', 'mm', 'A4')
-    pdf.add_page()
-    pdf.add_font(
-        'DejaVu', '', f'{BASE_DIR}/fonts/DejaVuSansCondensed.ttf', uni=True
-    )
-    pdf.set_font('DejaVu', '', 14)
-    pdf.cell(40, 10, 'Ваш список покупок', 0, 1)
-    pdf.cell(40, 10, '', 0, 1)
-    pdf.set_font('DejaVu', '', 14)
-    pdf.cell(
-        200, 8, f"{'Ингредиент'.ljust(30)} {'Количество'.rjust(20)}", 0, 1
+def execute_cart_favorite_batch(request, model):
+    """Add or remove many recipes at once, existing state is skipped."""
+    serializer = RecipeIdsSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    recipe_ids = serializer.validated_data['recipes']
+    if request.method == 'POST':
+        key = 'added'
+        changed = model.objects.add(request.user, recipe_ids)
+    else:
+        key = 'removed'
+        changed = model.objects.remove(request.user, recipe_ids)
+    return Response({
+        key: changed,
+        'skipped': sorted(set(recipe_ids).difference(changed)),
+    }, status=status.HTTP_200_OK)
+
+
+def get_pantry_recipes(matches, ingredient_ids):
+    """Recipes of a page of pantry matches, in order, with the coverage
+    and the ingredients missing at home."""
+    recipes = Recipe.objects.in_bulk(
+        [recipe_id for recipe_id, _, _ in matches]
     )
-    pdf.line(10, 30, 150, 30)
-    pdf.line(10, 38, 150, 38)
-    for line in product_list:
-        name = line
-        measurement_unit = product_list[name]['measurement_unit']
-        amount = str(product_list[name]['amount'])
-        amount_string = f"{amount} {measurement_unit}"
-        string = f"{name.ljust(30)} {amount_string.rjust(20)}"
-        pdf.cell(200, 9, string, 0, 1)
-
-    pdf.output('shopping_cart.pdf', 'F')
-    return FileResponse(
-        open('shopping_cart.pdf', 'rb'),
-        as_attachment=True,
-        content_type='application/pdf'
+    missing = defaultdict(list)
+    if any(missing_count for _, _, missing_count in matches):
+        for amount in IngredientAmount.objects.filter(
+            recipe__in=recipes
+        ).exclude(
+            ingredient__in=ingredient_ids
+        ).select_related('ingredient').order_by('ingredient__name'):
+            missing[amount.recipe_id].append(amount)
+
+    result = []
+    for recipe_id, coverage, _ in matches:
+        # Recipes deleted since the index was built are left out.
+        recipe = recipes.get(recipe_id)
+        if recipe is not None:
+            recipe.coverage = coverage
+            recipe.missing_ingredients = missing[recipe_id]
+            result.append(recipe)
+    return result
+
+
+def get_shopping_list(user):
+    return ShoppingListItem.objects.filter(user=user).values(
+        'ingredient__name', 'ingredient__measurement_unit', 'total_amount'
+    ).order_by('ingredient__name', 'ingredient__measurement_unit')
+
+
+def get_shopping_list_summary(user):
+    return [
+        {
+            'name': item['ingredient__name'],
+            'measurement_unit': item['ingredient__measurement_unit'],
+            'amount': item['total_amount'],
+        }
+        for item in get_shopping_list(user)
+    ]
+
+
+class Echo:
+    """Pseudo-buffer that returns written values instead of storing them."""
+
+    def write(self, value):
+        return value
+
+
+def iter_text_lines(shopping_list):
+    for item in shopping_list:
+        amount_string = (
+            f"{item['total_amount']} {item['ingredient__measurement_unit']}"
+        )
+        yield (
+            f"{item['ingredient__name'].ljust(30)} "
+            f"{amount_string.rjust(20)}\n"
+        )
+
+
+def iter_csv_lines(shopping_list):
+    writer = csv.writer(Echo())
+    yield writer.writerow(('name', 'measurement_unit', 'amount'))
+    for item in shopping_list:
+        yield writer.writerow((
+            item['ingredient__name'],
+            item['ingredient__measurement_unit'],
+            item['total_amount'],
+        ))
+
+
+def iter_json_lines(shopping_list):
+    separator = '['
+    for item in shopping_list:
+        yield separator + json.dumps({
+            'name': item['ingredient__name'],
+            'measurement_unit': item['ingredient__measurement_unit'],
+            'amount': item['total_amount'],
+        }, ensure_ascii=False)
+        separator = ',\n'
+    yield '[]' if separator == '[' else ']'
+
+
+def create_pdf_file(user, shopping_list):
+    rows = list(shopping_list.values_list(
+        'ingredient__name', 'ingredient__measurement_unit', 'total_amount'
+    ))
+    try:
+        content = get_shopping_list_pdf(user, rows)
+    except futures.TimeoutError:
+        response = HttpResponse(status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        response['Retry-After'] = settings.PDF_RENDER_TIMEOUT
+        return response
+
+    response = HttpResponse(content, content_type='application/pdf')
+    response['Content-Disposition'] = (
+        'attachment; filename="shopping_cart.pdf"'
     )
+    return response
 
 
-def create_text_file(request):
-    objects = IngredientAmount.objects.filter(
-        recipe__is_in_shopping_cart__user=request.user
+SHOPPING_CART_FORMATS = {
+    'txt': (iter_text_lines, 'text/plain; charset=utf-8'),
+    'csv': (iter_csv_lines, 'text/csv; charset=utf-8'),
+    'json': (iter_json_lines, 'application/json; charset=utf-8'),
+    'pdf': (None, 'application/pdf'),
+}
+
+
+def create_shopping_cart_file(user, file_format):
+    shopping_list = get_shopping_list(user)
+    if file_format == 'pdf':
+        return create_pdf_file(user, shopping_list)
+
+    iter_lines, content_type = SHOPPING_CART_FORMATS[file_format]
+    # Rows are fetched here: under ASGI the streamed body is consumed
+    # outside of the view's thread, where queries are not allowed. The
+    # list has at most one row per ingredient.
+    response = StreamingHttpResponse(
+        iter_lines(list(shopping_list)), content_type=content_type
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="shopping_cart.{file_format}"'
     )
-    product_list = {}
-    for obj in objects:
-        name = obj.ingredient.name
-        amount = obj.amount
-        measurement_unit = obj.ingredient.measurement_unit
-        if name in product_list:
-            product_list[name]['amount'] += amount
-        else:
-            product_list[name] = {
-                'measurement_unit': measurement_unit,
-                'amount': amount
-            }
-
-    final_list = ''
-    for line in product_list:
-        name = line
-        measurement_unit = product_list[name]['measurement_unit']
-        amount = str(product_list[name]['amount'])
-        amount_string = f"{amount} {measurement_unit}"
-        string = f"{name.ljust(30)} {amount_string.rjust(20)}"
-        final_list += string + '\n'
-    return HttpResponse(final_list, content_type='text/plain; charset=utf8')
+    return response
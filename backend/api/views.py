@@ -1,31 +1,51 @@
 from django.contrib.auth import get_user_model
+from django.db.models import F
+from django.http import Http404
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework import viewsets
+from rest_framework import status, viewsets
 from rest_framework.decorators import action
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
 
+from recipes.feed import get_feed
 from recipes.models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
+from recipes.pantry import pantry_index
 
+from .authentication import token_cache
+from .cache import RecipeFeedCacheMixin, ReferenceCacheMixin
 from .filters import IngredientSeatchFilter, RecipeFilter
-from .pagination import RecipesPagination, ResponseOnlyPagination
+from .metrics import RequestMetricsMixin
+from .negotiation import IgnoreFormatContentNegotiation
+from .pagination import (FeedCursorPagination, RecipesCursorPagination,
+                         RecipesPagination, ResponseOnlyPagination)
 from .permissions import IsAuthorOrReadOnly
-from .serializers import (FavoriteSerializer, IngredientSerializer,
-                          RecipeSerializer, RecipeListSerializer,
-                          ShoppingCartSerializer, TagSerializer)
-from .utils import create_text_file, execute_cart_favorite
+from .serializers import (IngredientSerializer, PantryRecipeSerializer,
+                          PantrySerializer, RecipeSerializer,
+                          RecipeListSerializer, SimilarRecipeSerializer,
+                          TagSerializer)
+from .utils import (SHOPPING_CART_FORMATS, create_shopping_cart_file,
+                    execute_cart_favorite, execute_cart_favorite_batch,
+                    get_pantry_recipes, get_shopping_list_summary)
 
 
 User = get_user_model()
 
 
-class TagViewSet(viewsets.ModelViewSet):
+class TagViewSet(
+    RequestMetricsMixin, ReferenceCacheMixin, viewsets.ModelViewSet
+):
+    cache_namespace = 'tags'
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = (AllowAny,)
     pagination_class = ResponseOnlyPagination
 
 
-class IngredientViewSet(viewsets.ModelViewSet):
+class IngredientViewSet(
+    RequestMetricsMixin, ReferenceCacheMixin, viewsets.ModelViewSet
+):
+    cache_namespace = 'ingredients'
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = (AllowAny,)
@@ -34,7 +54,9 @@ class IngredientViewSet(viewsets.ModelViewSet):
     search_fields = ('$name',)
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(
+    RequestMetricsMixin, RecipeFeedCacheMixin, viewsets.ModelViewSet
+):
     queryset = Recipe.objects.all()
     serializer_class = RecipeListSerializer
     filter_backends = [DjangoFilterBackend]
@@ -42,38 +64,159 @@ class RecipeViewSet(viewsets.ModelViewSet):
     pagination_class = RecipesPagination
     permission_classes = (IsAuthorOrReadOnly,)
 
-    def get_serializer_class(self):
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            params = self.request.query_params
+            if self.action == 'feed':
+                self._paginator = FeedCursorPagination()
+            elif self.action == 'pantry':
+                self._paginator = self.pagination_class()
+            elif (
+                'cursor' in params or params.get('pagination') == 'cursor'
+            ):
+                self._paginator = RecipesCursorPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
+    def get_queryset(self):
+        if self.action == 'feed':
+            return get_feed().get_queryset(
+                self.request.user
+            ).with_related().with_user_flags(self.request.user)
         if self.action in ('list', 'retrieve'):
+            return Recipe.objects.with_related().with_user_flags(
+                self.request.user
+            )
+        return Recipe.objects.all()
+
+    def get_serializer_class(self):
+        if self.action in ('list', 'retrieve', 'feed'):
             return RecipeListSerializer
         return RecipeSerializer
 
+    @action(
+        methods=['GET'],
+        detail=False,
+        permission_classes=(IsAuthenticated,),
+    )
+    def feed(self, request):
+        """New recipes of followed authors, with keyset pagination."""
+        page = self.paginate_queryset(self.get_queryset())
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(
+        methods=['GET'],
+        detail=False,
+        permission_classes=(AllowAny,),
+    )
+    def pantry(self, request):
+        """Recipes ranked by the share of their ingredients found in
+        ``?ingredients=id&ingredients=id``, with the missing ones."""
+        serializer = PantrySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        ingredient_ids = serializer.validated_data.get('ingredients', [])
+        page = self.paginate_queryset(pantry_index.match(ingredient_ids))
+        serializer = PantryRecipeSerializer(
+            get_pantry_recipes(page, ingredient_ids), many=True
+        )
+        return self.get_paginated_response(serializer.data)
+
+    @action(
+        methods=['GET'],
+        detail=True,
+        permission_classes=(AllowAny,),
+    )
+    def similar(self, request, pk):
+        """Precomputed similar recipes, most similar first."""
+        try:
+            recipe_id = int(pk)
+        except ValueError:
+            raise Http404
+        recipes = Recipe.objects.filter(
+            similar_to__recipe=recipe_id
+        ).annotate(
+            similarity=F('similar_to__score')
+        ).order_by('-similarity', 'id')
+        if not recipes and not Recipe.objects.filter(pk=recipe_id).exists():
+            raise Http404
+        serializer = SimilarRecipeSerializer(recipes, many=True)
+        return Response(serializer.data)
+
     @action(
         methods=['POST', 'DELETE'],
         detail=True,
         permission_classes=(IsAuthenticated,),
     )
     def favorite(self, request, pk):
-        response = execute_cart_favorite(
-            request, pk, FavoriteSerializer, Favorite
-        )
+        response = execute_cart_favorite(request, pk, Favorite)
         return response
 
+    @action(
+        methods=['POST', 'DELETE'],
+        detail=False,
+        url_path='favorite',
+        url_name='favorite-batch',
+        permission_classes=(IsAuthenticated,),
+    )
+    def favorite_batch(self, request):
+        return execute_cart_favorite_batch(request, Favorite)
+
     @action(
         methods=['POST', 'DELETE'],
         detail=True,
         permission_classes=(IsAuthenticated,),
     )
     def shopping_cart(self, request, pk):
-        response = execute_cart_favorite(
-            request, pk, ShoppingCartSerializer, ShoppingCart
-        )
+        response = execute_cart_favorite(request, pk, ShoppingCart)
         return response
 
+    @action(
+        methods=['POST', 'DELETE'],
+        detail=False,
+        url_path='shopping_cart',
+        url_name='shopping-cart-batch',
+        permission_classes=(IsAuthenticated,),
+    )
+    def shopping_cart_batch(self, request):
+        return execute_cart_favorite_batch(request, ShoppingCart)
+
     @action(
         methods=['GET'],
         detail=False,
-        permission_classes=(IsAuthenticated,)
+        url_path='shopping_cart/summary',
+        url_name='shopping-cart-summary',
+        permission_classes=(IsAuthenticated,),
+    )
+    def shopping_cart_summary(self, request):
+        return Response(get_shopping_list_summary(request.user))
+
+    @action(
+        methods=['GET'],
+        detail=False,
+        permission_classes=(IsAuthenticated,),
+        content_negotiation_class=IgnoreFormatContentNegotiation,
     )
     def download_shopping_cart(self, request):
-        file = create_text_file(request)
+        file_format = request.query_params.get('format', 'txt')
+        if file_format not in SHOPPING_CART_FORMATS:
+            return Response(
+                {'format': [
+                    'Доступные форматы: '
+                    + ', '.join(SHOPPING_CART_FORMATS)
+                ]},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        file = create_shopping_cart_file(request.user, file_format)
         return file
+
+
+class TokenCacheStatsView(APIView):
+    """Token cache counters of the process that serves the request."""
+
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        return Response(token_cache.get_stats())
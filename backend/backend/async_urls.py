@@ -0,0 +1,53 @@
+"""URLConf of the ASGI deployment.
+
+Hot read endpoints are served by async views, everything else falls
+through to ``backend.urls``.
+"""
+from django.urls import path
+
+from api.async_views import async_read_view
+from api.views import IngredientViewSet, RecipeViewSet, TagViewSet
+from users.views import UserViewSet
+
+from .urls import urlpatterns as sync_urlpatterns
+
+LIST_ACTIONS = {'get': 'list', 'post': 'create'}
+DETAIL_ACTIONS = {
+    'get': 'retrieve',
+    'put': 'update',
+    'patch': 'partial_update',
+    'delete': 'destroy',
+}
+
+urlpatterns = []
+for prefix, viewset in (
+    ('recipes', RecipeViewSet),
+    ('tags', TagViewSet),
+    ('ingredients', IngredientViewSet),
+):
+    urlpatterns += [
+        path(
+            f'api/{prefix}/',
+            async_read_view(
+                viewset, LIST_ACTIONS, basename=prefix, detail=False
+            ),
+            name=f'{prefix}-list'
+        ),
+        path(
+            f'api/{prefix}/<int:pk>/',
+            async_read_view(
+                viewset, DETAIL_ACTIONS, basename=prefix, detail=True
+            ),
+            name=f'{prefix}-detail'
+        ),
+    ]
+
+urlpatterns += [
+    path(
+        'api/users/me/',
+        async_read_view(
+            UserViewSet, {'get': 'self_user'}, basename='users', detail=False
+        ),
+        name='users-self-user'
+    ),
+] + sync_urlpatterns
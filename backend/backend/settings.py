@@ -36,6 +36,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -46,7 +47,7 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-ROOT_URLCONF = 'backend.urls'
+ROOT_URLCONF = os.getenv('ROOT_URLCONF', default='backend.urls')
 
 TEMPLATES = [
     {
@@ -79,6 +80,15 @@ DATABASES = {
 }
 
 
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', default=''),
+    }
+}
 
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -120,7 +130,7 @@ REST_FRAMEWORK = {
     ],
 
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
 
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
@@ -130,3 +140,106 @@ REST_FRAMEWORK = {
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'users.User'
+
+INGREDIENT_SEARCH_LIMIT = 20
+INGREDIENT_INDEX_MAX_AGE = 300
+
+SEARCH_CONFIG = 'russian'
+
+PDF_RENDER_WORKERS = 2
+PDF_RENDER_TIMEOUT = 10
+PDF_CACHE_TIMEOUT = 60 * 60
+
+IMAGE_MAX_BYTES = 10 * 1024 * 1024
+IMAGE_MAX_PIXELS = 40_000_000
+IMAGE_MAX_SIZE = (1920, 1920)
+IMAGE_THUMBNAILS = {
+    'card': (480, 480),
+    'detail': (1080, 1080),
+}
+IMAGE_WORKERS = 2
+
+RECIPES_LIMIT_DEFAULT = 3
+RECIPES_LIMIT_MAX = 100
+RECIPES_BATCH_MAX = 100
+
+# Subscription feed: 'pull' reads followed authors' recipes on request,
+# 'push' writes feed rows on publication (run rebuild_feeds on switch).
+FEED_STRATEGY = os.getenv('FEED_STRATEGY', default='pull')
+FEED_MAX_ENTRIES = 500
+
+# Similar recipes by ingredients and tags, see build_similar_recipes.
+SIMILAR_RECIPES_TOP_K = 10
+SIMILAR_RECIPES_TAG_WEIGHT = 0.5
+SIMILAR_RECIPES_CHUNK_SIZE = 500
+SIMILAR_RECIPES_CANDIDATES = 100
+SIMILARITY_INDEX_MAX_AGE = 600
+
+# "What can I cook": in-memory index of ingredient ids to recipes.
+PANTRY_INGREDIENTS_MAX = 100
+PANTRY_INDEX_MAX_AGE = 600
+
+REFERENCE_CACHE_TIMEOUT = 60 * 60 * 24
+REFERENCE_CACHE_MAX_AGE = 60
+FEED_CACHE_TIMEOUT = 60 * 60
+
+# Token owners: a local LRU per process in front of the shared cache.
+AUTH_TOKEN_CACHE_TIMEOUT = 5 * 60
+AUTH_TOKEN_LOCAL_TTL = int(os.getenv('AUTH_TOKEN_LOCAL_TTL', default=10))
+AUTH_TOKEN_LOCAL_SIZE = 10000
+
+ASYNC_DB_THREADS = int(os.getenv('ASYNC_DB_THREADS', default=8))
+
+SERVER_TIMING_HEADER = True
+
+# Query budgets by URL name, split by viewset action where one URL serves
+# both reads and writes.
+QUERY_BUDGETS = {
+    'recipes-list': {'list': 6, 'create': 30},
+    'recipes-detail': {
+        'retrieve': 6, 'update': 30, 'partial_update': 30, 'destroy': 20,
+    },
+    'recipes-favorite': 5,
+    'recipes-favorite-batch': 5,
+    'recipes-shopping-cart': 7,
+    'recipes-shopping-cart-batch': 7,
+    'recipes-shopping-cart-summary': 2,
+    'recipes-download-shopping-cart': 3,
+    'recipes-feed': 5,
+    'recipes-similar': 2,
+    'recipes-pantry': 3,
+    'tags-list': 2,
+    'tags-detail': 1,
+    'ingredients-list': 2,
+    'ingredients-detail': 1,
+    'users-list': {'list': 4, 'create': 4},
+    'users-detail': 4,
+    'users-self-user': 4,
+    'users-subscriptions': 5,
+    'users-subscribe': 8,
+    'users-set-password': 4,
+    'login': 6,
+    'logout': 5,
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'metrics': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'message',
+        },
+    },
+    'loggers': {
+        'api.metrics': {
+            'handlers': ['metrics'],
+            # INFO also logs the metrics of every request.
+            'level': os.getenv('METRICS_LOG_LEVEL', default='WARNING'),
+            'propagate': False,
+        },
+    },
+}
@@ -15,12 +15,15 @@ class TagAdmin(admin.ModelAdmin):
 class RecipeAdmin(admin.ModelAdmin):
     fields = [
         'tags', 'author', 'ingredients', 'name', 'image', 'text',
-        'cooking_time', 'pub_date', 'recipe_favorited_count'
+        'cooking_time', 'pub_date', 'favorites_count', 'shopping_cart_count'
     ]
-    readonly_fields = ('pub_date', 'recipe_favorited_count')
+    readonly_fields = ('pub_date', 'favorites_count', 'shopping_cart_count')
+    list_display = ('name', 'author', 'favorites_count', 'pub_date')
 
-    def get_recipe_favorited_count(self, obj):
-        return obj.recipe_favorited_count()
+    def save_model(self, request, obj, form, change):
+        if 'image' in form.changed_data:
+            obj.thumbnails_ready = False
+        super().save_model(request, obj, form, change)
 
 
 admin.site.register(Favorite)
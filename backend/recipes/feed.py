@@ -0,0 +1,144 @@
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F
+
+from users.models import Subscribtion
+
+from .models import FeedEntry, Recipe
+
+ENTRIES_TABLE = FeedEntry._meta.db_table
+RECIPES_TABLE = Recipe._meta.db_table
+SUBSCRIPTIONS_TABLE = Subscribtion._meta.db_table
+
+# Deletes feed rows past the newest ``FEED_MAX_ENTRIES`` of each user
+# matched by ``{users}``.
+TRIM = (
+    f'DELETE FROM {ENTRIES_TABLE} WHERE id IN ('
+    'SELECT id FROM ('
+    'SELECT id, ROW_NUMBER() OVER ('
+    'PARTITION BY user_id ORDER BY pub_date DESC, recipe_id DESC'
+    f') AS position FROM {ENTRIES_TABLE} WHERE user_id {{users}}'
+    ') ranked WHERE position > %s)'
+)
+
+
+class PullFeed:
+    """Feed read on request with one ``author IN (subquery)`` query.
+
+    The (author, pub_date, id) index of recipes serves it, nothing is
+    written when recipes are published.
+    """
+
+    name = 'pull'
+
+    def get_queryset(self, user):
+        return Recipe.objects.filter(
+            author__in=Subscribtion.objects.filter(
+                user=user
+            ).values('author')
+        ).annotate(feed_pub_date=F('pub_date'))
+
+    def recipe_created(self, recipe, using='default'):
+        pass
+
+    def subscribed(self, user_id, author_id, using='default'):
+        pass
+
+    def unsubscribed(self, user_id, author_id, using='default'):
+        pass
+
+    def rebuild(self, using='default'):
+        FeedEntry.objects.using(using).all().delete()
+        return 0
+
+
+class PushFeed:
+    """Feed rows written for every follower when a recipe is published
+    (fan-out on write), at most ``FEED_MAX_ENTRIES`` per user.
+
+    Reading is a range scan of the user's rows, the cost moves to
+    publishing, which grows with the number of followers.
+    """
+
+    name = 'push'
+
+    def get_queryset(self, user):
+        return Recipe.objects.filter(feed_entries__user=user).annotate(
+            feed_pub_date=F('feed_entries__pub_date')
+        )
+
+    def execute(self, using, sql, params):
+        with connections[using].cursor() as cursor:
+            cursor.execute(sql, params)
+
+    def recipe_created(self, recipe, using='default'):
+        self.execute(
+            using,
+            f'INSERT INTO {ENTRIES_TABLE} (user_id, recipe_id, pub_date) '
+            f'SELECT user_id, %s, %s FROM {SUBSCRIPTIONS_TABLE} '
+            'WHERE author_id = %s',
+            (
+                recipe.pk,
+                connections[using].ops.adapt_datetimefield_value(
+                    recipe.pub_date
+                ),
+                recipe.author_id,
+            )
+        )
+        self.execute(
+            using,
+            TRIM.format(users=(
+                f'IN (SELECT user_id FROM {SUBSCRIPTIONS_TABLE} '
+                'WHERE author_id = %s)'
+            )),
+            (recipe.author_id, settings.FEED_MAX_ENTRIES)
+        )
+
+    def subscribed(self, user_id, author_id, using='default'):
+        self.execute(
+            using,
+            f'INSERT INTO {ENTRIES_TABLE} (user_id, recipe_id, pub_date) '
+            f'SELECT %s, id, pub_date FROM {RECIPES_TABLE} '
+            'WHERE author_id = %s ORDER BY pub_date DESC, id DESC LIMIT %s '
+            'ON CONFLICT (user_id, recipe_id) DO NOTHING',
+            (user_id, author_id, settings.FEED_MAX_ENTRIES)
+        )
+        self.execute(
+            using, TRIM.format(users='= %s'),
+            (user_id, settings.FEED_MAX_ENTRIES)
+        )
+
+    def unsubscribed(self, user_id, author_id, using='default'):
+        FeedEntry.objects.using(using).filter(
+            user_id=user_id, recipe__author_id=author_id
+        ).delete()
+
+    def rebuild(self, using='default'):
+        """Refill all feeds from the subscriptions, return the row count."""
+        with transaction.atomic(using=using):
+            FeedEntry.objects.using(using).all().delete()
+            with connections[using].cursor() as cursor:
+                cursor.execute(
+                    f'INSERT INTO {ENTRIES_TABLE} '
+                    '(user_id, recipe_id, pub_date) '
+                    'SELECT user_id, recipe_id, pub_date FROM ('
+                    'SELECT s.user_id, r.id AS recipe_id, r.pub_date, '
+                    'ROW_NUMBER() OVER (PARTITION BY s.user_id '
+                    'ORDER BY r.pub_date DESC, r.id DESC) AS position '
+                    f'FROM {SUBSCRIPTIONS_TABLE} s '
+                    f'JOIN {RECIPES_TABLE} r ON r.author_id = s.author_id'
+                    ') ranked WHERE position <= %s',
+                    (settings.FEED_MAX_ENTRIES,)
+                )
+                return cursor.rowcount
+
+
+FEED_STRATEGIES = {
+    PullFeed.name: PullFeed,
+    PushFeed.name: PushFeed,
+}
+
+
+def get_feed(name=None):
+    """Feed strategy by name, ``FEED_STRATEGY`` by default."""
+    return FEED_STRATEGIES[name or settings.FEED_STRATEGY]()
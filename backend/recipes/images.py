@@ -0,0 +1,112 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import PurePosixPath
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+ALLOWED_FORMATS = ('JPEG', 'PNG', 'WEBP', 'GIF')
+THUMBNAILS_DIR = 'recipes/thumbs'
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.IMAGE_WORKERS, thread_name_prefix='thumbnails'
+)
+
+
+class ImageError(ValueError):
+    pass
+
+
+def has_alpha(image):
+    return image.mode in ('RGBA', 'LA') or (
+        image.mode == 'P' and 'transparency' in image.info
+    )
+
+
+def encode(image, image_format):
+    """Encode the image, return its bytes and file extension."""
+    buffer = BytesIO()
+    if image_format == 'WEBP':
+        image.save(buffer, 'WEBP', quality=80, method=4)
+        return buffer.getvalue(), 'webp'
+    if has_alpha(image):
+        image.save(buffer, 'PNG', optimize=True)
+        return buffer.getvalue(), 'png'
+    image.convert('RGB').save(buffer, 'JPEG', quality=85, optimize=True)
+    return buffer.getvalue(), 'jpg'
+
+
+def open_image(data):
+    """Open image bytes checking format and dimensions before decoding."""
+    try:
+        image = Image.open(BytesIO(data))
+    except (OSError, Image.DecompressionBombError):
+        raise ImageError('Файл не является изображением')
+    if image.format not in ALLOWED_FORMATS:
+        raise ImageError('Неподдерживаемый формат изображения')
+    if image.width * image.height > settings.IMAGE_MAX_PIXELS:
+        raise ImageError('Слишком большое разрешение изображения')
+    return image
+
+
+def process_upload(data):
+    """Check limits and re-encode an uploaded image within IMAGE_MAX_SIZE."""
+    if len(data) > settings.IMAGE_MAX_BYTES:
+        raise ImageError('Слишком большой файл изображения')
+    image = open_image(data)
+    try:
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail(settings.IMAGE_MAX_SIZE, Image.LANCZOS)
+    except (OSError, Image.DecompressionBombError):
+        raise ImageError('Повреждённый файл изображения')
+
+    content, extension = encode(image, None)
+    return ContentFile(content, name=f'image.{extension}')
+
+
+def thumbnail_name(name, size, extension=None):
+    path = PurePosixPath(name)
+    extension = extension or path.suffix.lstrip('.')
+    return f'{THUMBNAILS_DIR}/{path.stem}_{size}.{extension}'
+
+
+def generate_thumbnails(name):
+    """Write card and detail thumbnails of a stored image, with WebP
+    variants, and mark recipes using the image as ready."""
+    from .models import Recipe
+    from .signals import recipes_updated
+
+    try:
+        with Recipe._meta.get_field('image').storage.open(name) as file:
+            image = Image.open(BytesIO(file.read()))
+            image.load()
+        for size, dimensions in settings.IMAGE_THUMBNAILS.items():
+            thumbnail = image.copy()
+            thumbnail.thumbnail(dimensions, Image.LANCZOS)
+            for image_format in (None, 'WEBP'):
+                content, extension = encode(thumbnail, image_format)
+                path = thumbnail_name(name, size, extension)
+                if not default_storage.exists(path):
+                    default_storage.save(path, ContentFile(content))
+        recipes = Recipe.objects.filter(image=name)
+        recipe_ids = list(recipes.values_list('id', flat=True))
+        recipes.update(thumbnails_ready=True)
+        recipes_updated.send(sender=Recipe, recipe_ids=recipe_ids)
+    except Exception:
+        logger.exception('Не удалось создать миниатюры для %s', name)
+    finally:
+        close_old_connections()
+
+
+def schedule_thumbnails(name):
+    executor.submit(generate_thumbnails, name)
+
+
+def thumbnail_url(name, size, extension=None):
+    return default_storage.url(thumbnail_name(name, size, extension))
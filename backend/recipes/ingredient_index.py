@@ -0,0 +1,113 @@
+import bisect
+import time
+from collections import defaultdict, namedtuple
+
+from django.conf import settings
+from django.db.models import Count
+
+from .models import Ingredient, IngredientAmount
+from .utils import LocalIndex
+
+NGRAM_SIZE = 3
+
+IndexState = namedtuple(
+    'IndexState',
+    ('built_at', 'ingredients', 'normalized', 'names', 'usage', 'ngrams')
+)
+
+
+def normalize(value):
+    return value.strip().lower()
+
+
+def get_ngrams(value):
+    return {
+        value[i:i + NGRAM_SIZE]
+        for i in range(len(value) - NGRAM_SIZE + 1)
+    }
+
+
+class IngredientIndex(LocalIndex):
+    """Process-local search index over the ingredient catalog.
+
+    Keeps a sorted array of names for prefix lookups and a trigram index
+    for substring lookups. Prefix matches are ranked before substring
+    matches, ties are broken by how often the ingredient is used in
+    recipes. The index is rebuilt lazily after invalidation or once it is
+    older than ``INGREDIENT_INDEX_MAX_AGE`` seconds, so changes made by
+    other processes are picked up as well.
+    """
+
+    max_age_setting = 'INGREDIENT_INDEX_MAX_AGE'
+
+    def build(self, using='default'):
+        ingredients = {
+            ingredient.id: ingredient
+            for ingredient in Ingredient.objects.using(using)
+        }
+        usage = dict(
+            IngredientAmount.objects.using(using).values(
+                'ingredient'
+            ).annotate(
+                count=Count('id')
+            ).values_list('ingredient', 'count')
+        )
+        normalized = {
+            pk: normalize(ingredient.name)
+            for pk, ingredient in ingredients.items()
+        }
+        names = sorted((name, pk) for pk, name in normalized.items())
+        ngrams = defaultdict(set)
+        for name, pk in names:
+            for ngram in get_ngrams(name):
+                ngrams[ngram].add(pk)
+
+        return IndexState(
+            built_at=time.monotonic(),
+            ingredients=ingredients,
+            normalized=normalized,
+            names=names,
+            usage=usage,
+            ngrams=dict(ngrams),
+        )
+
+    def search(self, term, limit=None):
+        term = normalize(term)
+        if limit is None:
+            limit = settings.INGREDIENT_SEARCH_LIMIT
+        if not term:
+            return []
+
+        state = self.get_state()
+        names = state.names
+
+        prefix_hits = []
+        position = bisect.bisect_left(names, (term,))
+        while position < len(names) and names[position][0].startswith(term):
+            prefix_hits.append(names[position][1])
+            position += 1
+
+        if len(term) >= NGRAM_SIZE:
+            postings = sorted(
+                (state.ngrams.get(ngram, set()) for ngram in get_ngrams(term)),
+                key=len
+            )
+            candidates = set.intersection(*postings)
+        else:
+            candidates = state.ingredients.keys()
+
+        prefix_ids = set(prefix_hits)
+        substring_hits = [
+            pk for pk in candidates
+            if pk not in prefix_ids and term in state.normalized[pk]
+        ]
+
+        def rank(pk):
+            return -state.usage.get(pk, 0), state.normalized[pk]
+
+        ranked = sorted(prefix_hits, key=rank)
+        ranked += sorted(substring_hits, key=rank)
+        return [state.ingredients[pk] for pk in ranked[:limit]]
+
+
+ingredient_index = IngredientIndex()
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from recipes.similarity import build_similar_recipes
+
+
+class Command(BaseCommand):
+    help = 'Пересчёт похожих рецептов по ингредиентам и тегам'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top-k', type=int,
+            help='Похожих рецептов на рецепт, по умолчанию '
+                 'SIMILAR_RECIPES_TOP_K из настроек'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int,
+            help='Рецептов в одном блоке умножения матриц, по умолчанию '
+                 'SIMILAR_RECIPES_CHUNK_SIZE из настроек'
+        )
+
+    def handle(self, top_k, chunk_size, **kwargs):
+        if (top_k is not None and top_k < 1) or (
+            chunk_size is not None and chunk_size < 1
+        ):
+            raise CommandError('--top-k и --chunk-size должны быть больше 0')
+        started = time.monotonic()
+        count = build_similar_recipes(top_k, chunk_size)
+        self.stdout.write(self.style.SUCCESS(
+            f'Строк похожих рецептов: {count}, '
+            f'время: {time.monotonic() - started:.1f} с'
+        ))
@@ -0,0 +1,247 @@
+import random
+import time
+from datetime import timedelta
+from io import BytesIO
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image
+from recipes.images import generate_thumbnails
+from recipes.models import (Favorite, Ingredient, IngredientAmount, Recipe,
+                            ShoppingCart, Tag)
+from recipes.search import update_search_index
+from users.models import Subscribtion
+
+User = get_user_model()
+
+PASSWORD = 'benchmark'
+FIRST_NAMES = ('Анна', 'Иван', 'Мария', 'Пётр', 'Ольга', 'Сергей', 'Елена')
+LAST_NAMES = ('Иванова', 'Смирнов', 'Кузнецова', 'Попов', 'Соколова')
+DISHES = (
+    'Суп', 'Салат', 'Рагу', 'Запеканка', 'Пирог', 'Каша', 'Омлет',
+    'Паста', 'Плов', 'Котлеты', 'Блины', 'Смузи',
+)
+AMOUNTS = (1, 2, 3, 5, 10, 30, 50, 100, 150, 200, 250, 300, 500)
+IMAGE_COUNT = 8
+
+
+def zipf_weights(count, exponent=1.1):
+    """Cumulative weights of a Zipf-like popularity distribution."""
+    total = 0.0
+    weights = []
+    for rank in range(1, count + 1):
+        total += 1 / rank ** exponent
+        weights.append(total)
+    return weights
+
+
+def sample_distinct(rng, population, cum_weights, count):
+    count = min(count, len(population))
+    chosen = set()
+    while len(chosen) < count:
+        chosen.update(
+            rng.choices(population, cum_weights=cum_weights, k=count)
+        )
+    return rng.sample(
+        sorted(chosen, key=lambda item: getattr(item, 'pk', item)), count
+    )
+
+
+def poisson_like(rng, mean):
+    """Non-negative count with the given mean and a long tail."""
+    return int(rng.expovariate(1 / mean)) if mean > 0 else 0
+
+
+class Command(BaseCommand):
+    help = (
+        'Генерация детерминированного набора данных для нагрузочных тестов: '
+        'пользователи, рецепты, избранное, корзины и подписки'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument('--favorites', type=float, default=10,
+                            help='Среднее число избранных на пользователя')
+        parser.add_argument('--carts', type=float, default=3,
+                            help='Среднее число рецептов в корзине')
+        parser.add_argument('--subscriptions', type=float, default=5,
+                            help='Среднее число подписок на пользователя')
+        parser.add_argument('--days', type=int, default=365,
+                            help='За сколько дней распределить публикации')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--prefix', default='bench_',
+                            help='Префикс имён созданных пользователей')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--clear', action='store_true',
+            help='Удалить ранее сгенерированные данные с тем же префиксом'
+        )
+
+    def handle(self, **options):
+        if options['users'] < 1 or options['batch_size'] < 1:
+            raise CommandError('--users и --batch-size должны быть больше 0')
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        prefix = options['prefix']
+
+        generated = User.objects.filter(username__startswith=prefix)
+        if generated.exists():
+            if not options['clear']:
+                raise CommandError(
+                    f'Пользователи с префиксом {prefix} уже есть, '
+                    'используйте --clear'
+                )
+            generated.delete()
+
+        if not Ingredient.objects.exists():
+            call_command('load_data', 'ingredients')
+        if not Tag.objects.exists():
+            call_command('load_data', 'tags')
+
+        started = time.monotonic()
+        with transaction.atomic():
+            users = self.create_users(prefix, options['users'])
+            authors = users[:max(len(users) // 5, 1)]
+            images = self.create_images()
+            recipes = self.create_recipes(
+                authors, images, options['recipes'], options['days']
+            )
+            self.create_relations(
+                users, recipes, Favorite, 'recipe', options['favorites']
+            )
+            self.create_relations(
+                users, recipes, ShoppingCart, 'recipe', options['carts']
+            )
+            self.create_relations(
+                users, authors, Subscribtion, 'author',
+                options['subscriptions']
+            )
+        for name in images:
+            generate_thumbnails(name)
+        update_search_index(recipe.pk for recipe in recipes)
+        call_command('recount_counters', stdout=self.stdout)
+        call_command('rebuild_shopping_lists', stdout=self.stdout)
+        call_command('rebuild_feeds', stdout=self.stdout)
+        call_command('build_similar_recipes', stdout=self.stdout)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано пользователей: {len(users)}, рецептов: {len(recipes)}, '
+            f'пароль: {PASSWORD}, время: {time.monotonic() - started:.1f} с'
+        ))
+
+    def bulk_create(self, model, objects, created=None):
+        """bulk_create that sets primary keys also where the backend does
+        not return them (SQLite on Django 3.2)."""
+        model.objects.bulk_create(objects, batch_size=self.batch_size)
+        if created is not None and objects and objects[0].pk is None:
+            ids = created.order_by('id').values_list('id', flat=True)
+            for obj, pk in zip(objects, ids):
+                obj.pk = pk
+        return objects
+
+    def create_users(self, prefix, count):
+        password = make_password(PASSWORD)
+        users = [
+            User(
+                username=f'{prefix}{number}',
+                email=f'{prefix}{number}@example.com',
+                first_name=self.rng.choice(FIRST_NAMES),
+                last_name=self.rng.choice(LAST_NAMES),
+                password=password,
+            )
+            for number in range(count)
+        ]
+        return self.bulk_create(
+            User, users, User.objects.filter(username__startswith=prefix)
+        )
+
+    def create_images(self):
+        storage = Recipe._meta.get_field('image').storage
+        names = []
+        for _ in range(IMAGE_COUNT):
+            color = tuple(self.rng.randrange(256) for _ in range(3))
+            buffer = BytesIO()
+            Image.new('RGB', (800, 600), color).save(buffer, 'JPEG')
+            names.append(storage.save(
+                'recipes/image/image.jpg', ContentFile(buffer.getvalue())
+            ))
+        return names
+
+    def create_recipes(self, authors, images, count, days):
+        rng = self.rng
+        tags = list(Tag.objects.order_by('id').values_list('id', flat=True))
+        ingredients = list(
+            Ingredient.objects.order_by('id').values_list('id', flat=True)
+        )
+        rng.shuffle(ingredients)
+        ingredient_weights = zipf_weights(len(ingredients))
+        author_weights = zipf_weights(len(authors))
+        now = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+
+        recipes = []
+        for number in range(count):
+            recipes.append(Recipe(
+                author=rng.choices(authors, cum_weights=author_weights)[0],
+                name=f'{rng.choice(DISHES)} №{number}',
+                text='Описание рецепта. ' * rng.randint(1, 20),
+                image=rng.choice(images),
+                cooking_time=min(max(int(rng.lognormvariate(3.4, 0.6)), 1),
+                                 600),
+            ))
+        self.bulk_create(Recipe, recipes, Recipe.objects.filter(
+            author__in=authors
+        ))
+
+        # pub_date is auto_now_add, spread it over the period afterwards.
+        for recipe in recipes:
+            recipe.pub_date = now - timedelta(
+                seconds=rng.randrange(days * 24 * 60 * 60)
+            )
+        Recipe.objects.bulk_update(
+            recipes, ['pub_date'], batch_size=self.batch_size
+        )
+
+        recipe_tags = []
+        amounts = []
+        for recipe in recipes:
+            recipe_tags += [
+                Recipe.tags.through(recipe_id=recipe.pk, tag_id=tag)
+                for tag in rng.sample(tags, min(rng.randint(1, 2), len(tags)))
+            ]
+            amounts += [
+                IngredientAmount(
+                    recipe_id=recipe.pk,
+                    ingredient_id=ingredient,
+                    amount=rng.choice(AMOUNTS),
+                )
+                for ingredient in sample_distinct(
+                    rng, ingredients, ingredient_weights, rng.randint(3, 12)
+                )
+            ]
+        self.bulk_create(Recipe.tags.through, recipe_tags)
+        self.bulk_create(IngredientAmount, amounts)
+        return recipes
+
+    def create_relations(self, users, targets, model, field, mean):
+        """Link users to popular targets, e.g. favorites or subscriptions."""
+        rng = self.rng
+        targets = list(targets)
+        rng.shuffle(targets)
+        weights = zipf_weights(len(targets))
+        relations = []
+        for user in users:
+            count = poisson_like(rng, mean)
+            if not count:
+                continue
+            relations += [
+                model(user=user, **{field: target})
+                for target in sample_distinct(rng, targets, weights, count)
+                if target != user
+            ]
+        self.bulk_create(model, relations)
@@ -0,0 +1,142 @@
+import csv
+import json
+import time
+from itertools import islice
+from pathlib import Path
+
+from api.cache import bump_cache_version
+from django.core.management.base import BaseCommand, CommandError
+from recipes.models import Ingredient, Tag
+
+from backend.settings import BASE_DIR
+
+LOADERS = {
+    'ingredients': {
+        'model': Ingredient,
+        'fields': ('name', 'measurement_unit'),
+        'unique': ('name', 'measurement_unit'),
+        'path': BASE_DIR / 'data' / 'ingredients.csv',
+    },
+    'tags': {
+        'model': Tag,
+        'fields': ('name', 'color', 'slug'),
+        'unique': ('slug',),
+        'path': BASE_DIR / 'data' / 'tags.csv',
+    },
+}
+
+
+def iter_csv_rows(file, fields):
+    for row in csv.reader(file, delimiter=','):
+        row = tuple(value.strip() for value in row)
+        if not row or row == fields:
+            continue
+        yield row
+
+
+def iter_json_rows(file, fields, chunk_size=64 * 1024):
+    """Read a JSON array of objects item by item."""
+    decoder = json.JSONDecoder()
+    buffer = file.read(chunk_size).lstrip()
+    if not buffer.startswith('['):
+        raise CommandError('Ожидается JSON-массив объектов')
+    buffer = buffer[1:]
+    while True:
+        buffer = buffer.lstrip().lstrip(',').lstrip()
+        if buffer.startswith(']'):
+            return
+        try:
+            item, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            chunk = file.read(chunk_size)
+            if not chunk:
+                raise CommandError('Некорректный JSON')
+            buffer += chunk
+            continue
+        yield tuple(item[field].strip() for field in fields)
+        buffer = buffer[end:]
+
+
+def iter_batches(rows, batch_size):
+    rows = iter(rows)
+    batch = list(islice(rows, batch_size))
+    while batch:
+        yield batch
+        batch = list(islice(rows, batch_size))
+
+
+class Command(BaseCommand):
+    help = 'Загрузка ингредиентов или тегов в БД из .csv или .json'
+
+    def add_arguments(self, parser):
+        parser.add_argument('data', choices=LOADERS)
+        parser.add_argument(
+            '--path', type=Path,
+            help='Файл .csv или .json, по умолчанию из каталога data/'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Показать, какие записи будут добавлены, без записи в БД'
+        )
+
+    def get_rows(self, file, path, fields):
+        if path.suffix == '.json':
+            return iter_json_rows(file, fields)
+        return iter_csv_rows(file, fields)
+
+    def handle(self, data, path, batch_size, dry_run, **kwargs):
+        loader = LOADERS[data]
+        model = loader['model']
+        fields = loader['fields']
+        path = Path(path or loader['path'])
+        if batch_size < 1:
+            raise CommandError('--batch-size должен быть больше 0')
+
+        started = time.monotonic()
+        with open(path, 'r', encoding='UTF-8') as file:
+            rows = self.get_rows(file, path, fields)
+            if dry_run:
+                self.diff(model, fields, loader['unique'], rows)
+            else:
+                self.load(model, fields, rows, batch_size)
+                # bulk_create sends no post_save, so the cached
+                # responses are not dropped by the signal handlers.
+                bump_cache_version(data)
+        self.stdout.write(
+            f'Время: {time.monotonic() - started:.2f} с'
+        )
+
+    def load(self, model, fields, rows, batch_size):
+        count_before = model.objects.count()
+        total = 0
+        for batch in iter_batches(rows, batch_size):
+            model.objects.bulk_create(
+                (model(**dict(zip(fields, row))) for row in batch),
+                batch_size=batch_size,
+                ignore_conflicts=True,
+            )
+            total += len(batch)
+        created = model.objects.count() - count_before
+        self.stdout.write(self.style.SUCCESS(
+            f'Прочитано строк: {total}, добавлено: {created}, '
+            f'пропущено: {total - created}'
+        ))
+
+    def diff(self, model, fields, unique, rows):
+        positions = [fields.index(field) for field in unique]
+        existing = set(model.objects.values_list(*unique))
+        total = 0
+        new = []
+        for row in rows:
+            total += 1
+            key = tuple(row[position] for position in positions)
+            if key not in existing:
+                existing.add(key)
+                new.append(row)
+        for row in new:
+            self.stdout.write('+ ' + ', '.join(row))
+        self.stdout.write(self.style.SUCCESS(
+            f'Прочитано строк: {total}, будет добавлено: {len(new)}, '
+            f'уже в БД: {total - len(new)}'
+        ))
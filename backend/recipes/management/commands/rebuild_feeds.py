@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from recipes.feed import FEED_STRATEGIES, get_feed
+
+
+class Command(BaseCommand):
+    help = 'Пересчёт лент подписок для выбранной стратегии ленты'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--strategy', choices=sorted(FEED_STRATEGIES),
+            help='По умолчанию FEED_STRATEGY из настроек'
+        )
+
+    def handle(self, strategy, **kwargs):
+        feed = get_feed(strategy)
+        count = feed.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Стратегия {feed.name}, строк в лентах: {count}'
+        ))
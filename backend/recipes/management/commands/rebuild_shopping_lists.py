@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from recipes.shopping_list import rebuild_shopping_lists
+
+
+class Command(BaseCommand):
+    help = 'Пересчёт списков покупок всех пользователей по их корзинам'
+
+    def handle(self, **kwargs):
+        count = rebuild_shopping_lists()
+        self.stdout.write(self.style.SUCCESS(
+            f'Строк в списках покупок: {count}'
+        ))
@@ -0,0 +1,63 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import Subscribtion
+
+User = get_user_model()
+
+COUNTERS = (
+    (Recipe, 'favorites_count', Favorite, 'recipe'),
+    (Recipe, 'shopping_cart_count', ShoppingCart, 'recipe'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'followers_count', Subscribtion, 'author'),
+)
+
+
+def actual_count(related_model, related_field):
+    return Coalesce(
+        Subquery(
+            related_model.objects.filter(
+                **{related_field: OuterRef('pk')}
+            ).order_by().values(related_field).annotate(
+                count=Count('pk')
+            ).values('count')
+        ),
+        0
+    )
+
+
+class Command(BaseCommand):
+    help = 'Пересчёт счётчиков избранного, корзин, рецептов и подписчиков'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать расхождения'
+        )
+
+    def handle(self, dry_run, **kwargs):
+        started = time.monotonic()
+        total = 0
+        for model, field, related_model, related_field in COUNTERS:
+            drifted = list(
+                model.objects.annotate(
+                    actual=actual_count(related_model, related_field)
+                ).exclude(**{field: F('actual')}).values_list('pk', flat=True)
+            )
+            if drifted and not dry_run:
+                model.objects.filter(pk__in=drifted).update(
+                    **{field: actual_count(related_model, related_field)}
+                )
+            total += len(drifted)
+            self.stdout.write(
+                f'{model._meta.label}.{field}: расхождений {len(drifted)}'
+            )
+        action = 'найдено' if dry_run else 'исправлено'
+        self.stdout.write(self.style.SUCCESS(
+            f'Счётчиков проверено: {len(COUNTERS)}, {action} расхождений: '
+            f'{total}, время: {time.monotonic() - started:.1f} с'
+        ))
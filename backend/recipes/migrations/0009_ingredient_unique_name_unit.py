@@ -0,0 +1,80 @@
+# Generated by Django 3.2.16 on 2026-10-18 16:52
+
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+AMOUNT_MAX = 32767
+
+
+def merge_recipe_rows(model, ingredient_ids, keep_id, sum_amounts=False):
+    """Point recipe rows of the merged ingredients to ``keep_id``.
+
+    A recipe using several of them keeps its first row, with the amounts
+    summed when the model has them, so (recipe, ingredient) stays unique.
+    """
+    shared = model.objects.filter(
+        ingredient__in=ingredient_ids
+    ).values('recipe').annotate(
+        keep_row=Min('id'), count=Count('id')
+    ).filter(count__gt=1).order_by()
+    if sum_amounts:
+        shared = shared.annotate(total=Sum('amount'))
+    for row in shared:
+        model.objects.filter(
+            recipe=row['recipe'], ingredient__in=ingredient_ids
+        ).exclude(id=row['keep_row']).delete()
+        if sum_amounts:
+            model.objects.filter(id=row['keep_row']).update(
+                amount=min(row['total'], AMOUNT_MAX)
+            )
+    model.objects.filter(ingredient__in=ingredient_ids).exclude(
+        ingredient=keep_id
+    ).update(ingredient=keep_id)
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    IngredientAmount = apps.get_model('recipes', 'IngredientAmount')
+    RecipeIngredient = apps.get_model('recipes', 'Recipe').ingredients.through
+
+    duplicates = Ingredient.objects.values(
+        'name', 'measurement_unit'
+    ).annotate(
+        keep_id=Min('id'), count=Count('id')
+    ).filter(count__gt=1)
+    for duplicate in duplicates:
+        ingredient_ids = list(Ingredient.objects.filter(
+            name=duplicate['name'],
+            measurement_unit=duplicate['measurement_unit'],
+        ).values_list('id', flat=True))
+        merge_recipe_rows(
+            IngredientAmount, ingredient_ids, duplicate['keep_id'],
+            sum_amounts=True
+        )
+        merge_recipe_rows(
+            RecipeIngredient, ingredient_ids, duplicate['keep_id']
+        )
+        Ingredient.objects.filter(id__in=ingredient_ids).exclude(
+            id=duplicate['keep_id']
+        ).delete()
+    if schema_editor.connection.vendor == 'postgresql':
+        # Deferred FK checks of the moved rows would otherwise block the
+        # ALTER TABLE of the constraint below in the same transaction.
+        schema_editor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_alter_tag_color'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_ingredients, migrations.RunPython.noop
+        ),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(fields=('name', 'measurement_unit'), name='unique ingredient'),
+        ),
+    ]
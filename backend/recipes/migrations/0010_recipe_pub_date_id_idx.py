@@ -0,0 +1,25 @@
+# Generated by Django 3.2.16 on 2026-10-18 16:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_ingredient_unique_name_unit'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='recipe',
+            options={'ordering': ['-pub_date', '-id'], 'verbose_name': 'Рецепт', 'verbose_name_plural': 'Рецепты'},
+        ),
+        migrations.RemoveIndex(
+            model_name='recipe',
+            name='pub_date_idx',
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['pub_date', 'id'], name='pub_date_idx'),
+        ),
+    ]
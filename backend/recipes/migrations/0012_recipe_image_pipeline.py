@@ -0,0 +1,24 @@
+# Generated by Django 3.2.16 on 2026-10-18 16:57
+
+from django.db import migrations, models
+import recipes.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_recipe_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='thumbnails_ready',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(default=None, null=True, storage=recipes.storage.ContentHashStorage(), upload_to='recipes/image/', verbose_name='изображение'),
+        ),
+    ]
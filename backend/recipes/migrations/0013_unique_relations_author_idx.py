@@ -0,0 +1,87 @@
+# Generated by Django 3.2.16 on 2026-10-18 17:10
+
+from django.db import migrations, models
+from django.db.models import Count, Min, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+AMOUNT_MAX = 32767
+
+
+def count_related(model, field):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef('pk')}).order_by().values(
+                field
+            ).annotate(count=Count('pk')).values('count')
+        ),
+        0
+    )
+
+
+def get_duplicates(model, fields):
+    return model.objects.values(*fields).annotate(
+        keep_id=Min('id'), count=Count('id')
+    ).filter(count__gt=1).order_by()
+
+
+def remove_duplicate_relations(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    for model_name, counter in (
+        ('Favorite', 'favorites_count'),
+        ('ShoppingCart', 'shopping_cart_count'),
+    ):
+        model = apps.get_model('recipes', model_name)
+        recipe_ids = set()
+        for duplicate in get_duplicates(model, ('user', 'recipe')):
+            model.objects.filter(
+                user=duplicate['user'], recipe=duplicate['recipe']
+            ).exclude(id=duplicate['keep_id']).delete()
+            recipe_ids.add(duplicate['recipe'])
+        Recipe.objects.filter(id__in=recipe_ids).update(
+            **{counter: count_related(model, 'recipe')}
+        )
+
+
+def merge_duplicate_amounts(apps, schema_editor):
+    IngredientAmount = apps.get_model('recipes', 'IngredientAmount')
+    duplicates = get_duplicates(
+        IngredientAmount, ('recipe', 'ingredient')
+    ).annotate(total=Sum('amount'))
+    for duplicate in duplicates:
+        rows = IngredientAmount.objects.filter(
+            recipe=duplicate['recipe'], ingredient=duplicate['ingredient']
+        )
+        rows.exclude(id=duplicate['keep_id']).delete()
+        rows.update(amount=min(duplicate['total'], AMOUNT_MAX))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0012_recipe_image_pipeline'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            remove_duplicate_relations, migrations.RunPython.noop
+        ),
+        migrations.RunPython(
+            merge_duplicate_amounts, migrations.RunPython.noop
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['author', 'pub_date', 'id'], name='author_pub_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='favorite',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique favorite'),
+        ),
+        migrations.AddConstraint(
+            model_name='ingredientamount',
+            constraint=models.UniqueConstraint(fields=('recipe', 'ingredient'), name='unique recipe ingredient'),
+        ),
+        migrations.AddConstraint(
+            model_name='shoppingcart',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique shopping cart'),
+        ),
+    ]
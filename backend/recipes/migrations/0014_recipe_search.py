@@ -0,0 +1,71 @@
+# Generated by Django 3.2.16 on 2026-10-18 17:13
+
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations
+
+FTS_TABLE = 'recipes_recipe_fts'
+
+FILL_SEARCH_VECTOR = '''
+    UPDATE recipes_recipe r SET search_vector =
+        setweight(to_tsvector(%(config)s::regconfig, r.name), 'A')
+        || setweight(to_tsvector(%(config)s::regconfig, COALESCE((
+            SELECT string_agg(i.name, ' ')
+            FROM recipes_ingredientamount a
+            JOIN recipes_ingredient i ON i.id = a.ingredient_id
+            WHERE a.recipe_id = r.id
+        ), '')), 'B')
+        || setweight(to_tsvector(%(config)s::regconfig, r.text), 'C')
+'''
+
+FILL_FTS = f'''
+    INSERT INTO {FTS_TABLE} (rowid, name, ingredients, text)
+    SELECT r.id, r.name, COALESCE(GROUP_CONCAT(i.name, ' '), ''), r.text
+    FROM recipes_recipe r
+    LEFT JOIN recipes_ingredientamount a ON a.recipe_id = r.id
+    LEFT JOIN recipes_ingredient i ON i.id = a.ingredient_id
+    GROUP BY r.id
+'''
+
+
+def create_search_index(apps, schema_editor):
+    """GIN index over the stored vector on PostgreSQL, FTS5 on SQLite."""
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            FILL_SEARCH_VECTOR, {'config': settings.SEARCH_CONFIG}
+        )
+        schema_editor.execute(
+            'CREATE INDEX recipe_search_idx ON recipes_recipe '
+            'USING gin (search_vector)'
+        )
+    elif vendor == 'sqlite':
+        schema_editor.execute(
+            f'CREATE VIRTUAL TABLE {FTS_TABLE} '
+            'USING fts5(name, ingredients, text)'
+        )
+        schema_editor.execute(FILL_FTS)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS recipe_search_idx')
+    elif vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0013_unique_relations_author_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
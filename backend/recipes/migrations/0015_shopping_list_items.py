@@ -0,0 +1,46 @@
+# Generated by Django 3.2.16 on 2026-10-18 17:22
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+FILL_SHOPPING_LISTS = '''
+    INSERT INTO recipes_shoppinglistitem (user_id, ingredient_id, total_amount)
+    SELECT c.user_id, a.ingredient_id, SUM(a.amount)
+    FROM recipes_shoppingcart c
+    JOIN recipes_ingredientamount a ON a.recipe_id = c.recipe_id
+    GROUP BY c.user_id, a.ingredient_id
+'''
+
+
+def fill_shopping_lists(apps, schema_editor):
+    schema_editor.execute(FILL_SHOPPING_LISTS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0014_recipe_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShoppingListItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_amount', models.IntegerField(verbose_name='количество')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_list_items', to='recipes.ingredient', verbose_name='ингредиент')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_list', to=settings.AUTH_USER_MODEL, verbose_name='пользователь')),
+            ],
+            options={
+                'verbose_name': 'Ингредиент в списке покупок',
+                'verbose_name_plural': 'Списки покупок',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='shoppinglistitem',
+            constraint=models.UniqueConstraint(fields=('user', 'ingredient'), name='unique shopping list item'),
+        ),
+        migrations.RunPython(fill_shopping_lists, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 3.2.16 on 2026-10-18 18:02
+
+import django.contrib.postgres.indexes
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0017_similar_recipes'),
+    ]
+
+    operations = [
+        # 0014 created the index on PostgreSQL with raw SQL, this only
+        # records it in the model state.
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='recipe',
+                    index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='recipe_search_idx'),
+                ),
+            ],
+        ),
+    ]
@@ -1,10 +1,42 @@
 from colorfield.fields import ColorField
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator
-from django.db import models
+from django.db import connections, models, transaction
+from django.db.models import Exists, F, OuterRef, Prefetch
+
+from .search import search_recipes
+from .storage import ContentHashStorage
 
 User = get_user_model()
 
+# Single-statement add and remove of user recipes on PostgreSQL: the
+# CTE changes the rows and the recipe counter, the select reports the
+# recipes that actually changed.
+ADD_USER_RECIPES_SQL = '''
+WITH changed AS (
+    INSERT INTO {table} (user_id, recipe_id)
+    SELECT %s, id FROM {recipes} WHERE id = ANY(%s) ORDER BY id
+    ON CONFLICT (user_id, recipe_id) DO NOTHING
+    RETURNING recipe_id
+), counted AS (
+    UPDATE {recipes} SET {counter} = {counter} + 1
+    WHERE id IN (SELECT recipe_id FROM changed)
+)
+SELECT recipe_id FROM changed
+'''
+REMOVE_USER_RECIPES_SQL = '''
+WITH changed AS (
+    DELETE FROM {table} WHERE user_id = %s AND recipe_id = ANY(%s)
+    RETURNING recipe_id
+), counted AS (
+    UPDATE {recipes} SET {counter} = {counter} - 1
+    WHERE id IN (SELECT recipe_id FROM changed) AND {counter} > 0
+)
+SELECT recipe_id FROM changed
+'''
+
 
 class Ingredient(models.Model):
     name = models.CharField(
@@ -24,6 +56,12 @@ class Ingredient(models.Model):
         ordering = ['name']
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['name', 'measurement_unit'],
+                name='unique ingredient',
+            )
+        ]
 
     def __str__(self):
         return self.name
@@ -60,6 +98,39 @@ class Tag(models.Model):
         return self.name
 
 
+class RecipeQuerySet(models.QuerySet):
+
+    def with_related(self):
+        """Load author, tags and ingredient amounts in a fixed
+        number of queries."""
+        return self.select_related('author').defer(
+            'search_vector'
+        ).prefetch_related(
+            'tags',
+            Prefetch(
+                'recipe',
+                queryset=IngredientAmount.objects.select_related('ingredient')
+            ),
+        )
+
+    def with_user_flags(self, user):
+        """Annotate favorite and shopping cart flags of the user."""
+        if user.is_anonymous:
+            return self
+        return self.annotate(
+            favorited_by_user=Exists(
+                Favorite.objects.filter(user=user, recipe=OuterRef('pk'))
+            ),
+            in_user_shopping_cart=Exists(
+                ShoppingCart.objects.filter(user=user, recipe=OuterRef('pk'))
+            ),
+        )
+
+    def search(self, value):
+        """Full-text search over name, ingredients and text, ranked."""
+        return search_recipes(self, value)
+
+
 class Recipe(models.Model):
     tags = models.ManyToManyField(
         Tag,
@@ -86,9 +157,11 @@ class Recipe(models.Model):
     image = models.ImageField(
         verbose_name='изображение',
         upload_to='recipes/image/',
+        storage=ContentHashStorage(),
         null=True,
         default=None
     )
+    thumbnails_ready = models.BooleanField(default=False, editable=False)
     text = models.TextField(verbose_name='описание', blank=False, null=False)
     cooking_time = models.PositiveSmallIntegerField(
         verbose_name='время приготовления',
@@ -96,18 +169,34 @@ class Recipe(models.Model):
         null=False
     )
     pub_date = models.DateTimeField(auto_now_add=True)
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='в избранном',
+        default=0,
+        editable=False
+    )
+    shopping_cart_count = models.PositiveIntegerField(
+        verbose_name='в корзинах',
+        default=0,
+        editable=False
+    )
+    # Filled on PostgreSQL only, SQLite keeps search data in an FTS5 table.
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
-        ordering = ['-pub_date']
+        ordering = ['-pub_date', '-id']
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         indexes = [
-            models.Index(fields=['pub_date'], name='pub_date_idx')
+            models.Index(fields=['pub_date', 'id'], name='pub_date_idx'),
+            models.Index(
+                fields=['author', 'pub_date', 'id'],
+                name='author_pub_date_idx'
+            ),
+            GinIndex(fields=['search_vector'], name='recipe_search_idx'),
         ]
 
-    def recipe_favorited_count(self):
-        return Favorite.objects.filter(recipe=self).count()
-
     def __str__(self):
         return self.name
 
@@ -133,11 +222,123 @@ class IngredientAmount(models.Model):
         ordering = ['-amount']
         verbose_name = 'Ингредиент и его количество'
         verbose_name_plural = 'Ингредиенты и их количество'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'ingredient'],
+                name='unique recipe ingredient',
+            )
+        ]
 
     def __str__(self):
         return f'{self.recipe} = {self.ingredient} - {self.amount}'
 
 
+class UserRecipeQuerySet(models.QuerySet):
+    """Bulk add and remove of recipes in a user's list.
+
+    Rows are written without model signals, the recipe counter named by
+    ``recipe_counter`` of the model is updated here instead, and
+    ``recipes_added`` and ``recipes_removed`` run in the same transaction.
+    """
+
+    def add(self, user, recipe_ids):
+        """Add existing recipes not yet in the list, return their ids."""
+        recipe_ids = sorted(set(recipe_ids))
+        if not recipe_ids:
+            return []
+        with transaction.atomic(using=self.db):
+            if connections[self.db].vendor == 'postgresql':
+                added = self._execute(ADD_USER_RECIPES_SQL, user, recipe_ids)
+            else:
+                added = self._add_rows(user, recipe_ids)
+            if added:
+                self.recipes_added(user, added)
+        return added
+
+    def remove(self, user, recipe_ids):
+        """Remove recipes from the list, return ids of the removed ones."""
+        recipe_ids = sorted(set(recipe_ids))
+        if not recipe_ids:
+            return []
+        with transaction.atomic(using=self.db):
+            if connections[self.db].vendor == 'postgresql':
+                removed = self._execute(
+                    REMOVE_USER_RECIPES_SQL, user, recipe_ids
+                )
+            else:
+                removed = self._remove_rows(user, recipe_ids)
+            if removed:
+                self.recipes_removed(user, removed)
+        return removed
+
+    def recipes_added(self, user, recipe_ids):
+        pass
+
+    def recipes_removed(self, user, recipe_ids):
+        pass
+
+    def _add_rows(self, user, recipe_ids):
+        added = list(Recipe.objects.using(self.db).filter(
+            id__in=recipe_ids
+        ).exclude(
+            id__in=self.filter(user=user).values('recipe_id')
+        ).order_by('id').values_list('id', flat=True))
+        self.bulk_create(
+            [self.model(user=user, recipe_id=pk) for pk in added],
+            ignore_conflicts=True
+        )
+        self._update_counter(added, 1)
+        return added
+
+    def _remove_rows(self, user, recipe_ids):
+        removed = list(self.filter(
+            user=user, recipe_id__in=recipe_ids
+        ).order_by('recipe_id').values_list('recipe_id', flat=True))
+        if removed:
+            placeholders = ', '.join(['%s'] * len(removed))
+            with connections[self.db].cursor() as cursor:
+                cursor.execute(
+                    f'DELETE FROM {self.model._meta.db_table} '
+                    f'WHERE user_id = %s AND recipe_id IN ({placeholders})',
+                    [user.pk, *removed]
+                )
+        self._update_counter(removed, -1)
+        return removed
+
+    def _execute(self, sql, user, recipe_ids):
+        quote_name = connections[self.db].ops.quote_name
+        sql = sql.format(
+            table=quote_name(self.model._meta.db_table),
+            recipes=quote_name(Recipe._meta.db_table),
+            counter=quote_name(self.model.recipe_counter),
+        )
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(sql, (user.pk, recipe_ids))
+            return sorted(row[0] for row in cursor.fetchall())
+
+    def _update_counter(self, recipe_ids, delta):
+        if not recipe_ids:
+            return
+        field = self.model.recipe_counter
+        queryset = Recipe.objects.using(self.db).filter(id__in=recipe_ids)
+        if delta < 0:
+            queryset = queryset.filter(**{f'{field}__gte': -delta})
+        queryset.update(**{field: F(field) + delta})
+
+
+class ShoppingCartQuerySet(UserRecipeQuerySet):
+
+    def recipes_added(self, user, recipe_ids):
+        from .shopping_list import add_recipes
+
+        add_recipes(user.pk, recipe_ids, using=self.db)
+
+    def recipes_removed(self, user, recipe_ids):
+        from .shopping_list import remove_recipes
+
+        remove_recipes(user.pk, recipe_ids, using=self.db)
+
+
 class Favorite(models.Model):
     user = models.ForeignKey(
         User,
@@ -152,9 +353,18 @@ class Favorite(models.Model):
         on_delete=models.CASCADE
     )
 
+    objects = UserRecipeQuerySet.as_manager()
+    recipe_counter = 'favorites_count'
+
     class Meta:
         verbose_name = 'Избранный рецепт у пользователя'
         verbose_name_plural = 'Избранные рецепт у пользователей'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique favorite',
+            )
+        ]
 
     def __str__(self):
         return f'{self.recipe} в избранном у {self.user}'
@@ -174,9 +384,119 @@ class ShoppingCart(models.Model):
         on_delete=models.CASCADE
     )
 
+    objects = ShoppingCartQuerySet.as_manager()
+    recipe_counter = 'shopping_cart_count'
+
     class Meta:
         verbose_name = 'Рецепт в корзине у пользователя'
         verbose_name_plural = 'Рецепты в корзине у пользователей'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique shopping cart',
+            )
+        ]
 
     def __str__(self):
         return f'{self.recipe} в корзине у {self.user}'
+
+
+class ShoppingListItem(models.Model):
+    """Total amount of an ingredient over the recipes in a user's cart,
+    maintained by ``recipes.shopping_list``."""
+
+    user = models.ForeignKey(
+        User,
+        verbose_name='пользователь',
+        related_name='shopping_list',
+        on_delete=models.CASCADE
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        verbose_name='ингредиент',
+        related_name='shopping_list_items',
+        on_delete=models.CASCADE
+    )
+    total_amount = models.IntegerField('количество')
+
+    class Meta:
+        verbose_name = 'Ингредиент в списке покупок'
+        verbose_name_plural = 'Списки покупок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique shopping list item',
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.ingredient} - {self.total_amount} у {self.user}'
+
+
+class FeedEntry(models.Model):
+    """Recipe in the subscription feed of a user, written when the recipe
+    is published by the push feed strategy."""
+
+    user = models.ForeignKey(
+        User,
+        verbose_name='пользователь',
+        related_name='feed_entries',
+        on_delete=models.CASCADE
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        verbose_name='рецепт',
+        related_name='feed_entries',
+        on_delete=models.CASCADE
+    )
+    pub_date = models.DateTimeField('дата публикации')
+
+    class Meta:
+        verbose_name = 'Рецепт в ленте подписок'
+        verbose_name_plural = 'Ленты подписок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique feed entry',
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-recipe'],
+                name='feed_user_pub_date_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.recipe} в ленте у {self.user}'
+
+
+class SimilarRecipe(models.Model):
+    """Precomputed neighbour of a recipe by ingredients and tags."""
+
+    recipe = models.ForeignKey(
+        Recipe,
+        verbose_name='рецепт',
+        related_name='similar_recipes',
+        on_delete=models.CASCADE
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        verbose_name='похожий рецепт',
+        related_name='similar_to',
+        on_delete=models.CASCADE
+    )
+    score = models.FloatField('сходство')
+
+    class Meta:
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'similar'],
+                name='unique similar recipe',
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.similar} похож на {self.recipe}'
@@ -0,0 +1,196 @@
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from .models import IngredientAmount
+from .utils import LocalIndex, schedule_on_commit
+
+IndexState = namedtuple(
+    'IndexState',
+    ('built_at', 'recipe_ids', 'positions', 'sizes', 'ingredients',
+     'postings')
+)
+
+
+class PantryMatches:
+    """Recipes sharing ingredients with a pantry, ranked on slicing.
+
+    Recipes are ordered by the covered share of their ingredients, then
+    by the number of missing ones, newest first. Only the requested
+    prefix of the ranking is sorted, so pages stay cheap even when most
+    recipes match a common ingredient. Items are ``(recipe_id, coverage,
+    missing_count)`` tuples.
+    """
+
+    def __init__(self, recipe_ids, counts, sizes):
+        self.recipe_ids = recipe_ids
+        self.coverage = counts / sizes
+        self.missing = sizes - counts
+
+    def __len__(self):
+        return len(self.recipe_ids)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        stop = len(self) if index.stop is None else min(index.stop, len(self))
+        top = self.top(stop)[index]
+        return list(zip(
+            self.recipe_ids[top].tolist(),
+            self.coverage[top].tolist(),
+            self.missing[top].tolist(),
+        ))
+
+    def top(self, count):
+        candidates = np.arange(len(self))
+        if 0 < count < len(self):
+            # Every recipe covered at least as much as the count-th best.
+            kth = np.partition(-self.coverage, count - 1)[count - 1]
+            candidates = np.flatnonzero(-self.coverage <= kth)
+        order = np.lexsort((
+            -self.recipe_ids[candidates],
+            self.missing[candidates],
+            -self.coverage[candidates],
+        ))
+        return candidates[order][:count]
+
+
+class PantryIndex(LocalIndex):
+    """Process-local inverted index of ingredient ids to recipes.
+
+    Each posting is a sorted int32 array of recipe positions, so a pantry
+    lookup adds one array per pantry ingredient into a counter per recipe.
+    Saved recipes are applied on commit without touching the state readers
+    hold. The index is rebuilt once it is older than
+    ``PANTRY_INDEX_MAX_AGE`` seconds, which picks up changes made by other
+    processes.
+    """
+
+    max_age_setting = 'PANTRY_INDEX_MAX_AGE'
+
+    def build(self, using='default'):
+        rows = np.array(
+            IngredientAmount.objects.using(using).order_by().values_list(
+                'recipe', 'ingredient'
+            ),
+            dtype=np.int64
+        ).reshape(-1, 2)
+        rows = rows[np.argsort(rows[:, 0], kind='stable')]
+        recipe_ids, starts, recipe_positions = np.unique(
+            rows[:, 0], return_index=True, return_inverse=True
+        )
+        recipe_positions = recipe_positions.astype(np.int32)
+        ingredients = {}
+        if len(recipe_ids):
+            ingredients = dict(enumerate(
+                tuple(recipe_ingredients.tolist())
+                for recipe_ingredients in np.split(rows[:, 1], starts[1:])
+            ))
+
+        # Stable by position, so every posting comes out sorted.
+        order = np.argsort(rows[:, 1], kind='stable')
+        ingredient_ids, starts = np.unique(rows[order, 1], return_index=True)
+        postings = dict(zip(
+            ingredient_ids.tolist(),
+            np.split(recipe_positions[order], starts[1:])
+        ))
+
+        return IndexState(
+            built_at=time.monotonic(),
+            recipe_ids=recipe_ids,
+            positions={
+                recipe_id: position
+                for position, recipe_id in enumerate(recipe_ids.tolist())
+            },
+            sizes=np.bincount(
+                recipe_positions, minlength=len(recipe_ids)
+            ).astype(np.int32),
+            ingredients=ingredients,
+            postings=postings,
+        )
+
+    def update(self, recipes):
+        """Apply the current ingredient sets of recipes, an empty set
+        removes the recipe. Does nothing until the index is built."""
+        with self._lock:
+            state = self._state
+            if state is None:
+                return
+            recipe_ids = state.recipe_ids
+            positions = state.positions
+            sizes = state.sizes.copy()
+            ingredients = dict(state.ingredients)
+            postings = dict(state.postings)
+
+            added = [
+                recipe_id for recipe_id in sorted(recipes)
+                if recipe_id not in positions and recipes[recipe_id]
+            ]
+            if added:
+                positions = dict(positions)
+                for recipe_id in added:
+                    positions[recipe_id] = len(positions)
+                recipe_ids = np.append(recipe_ids, added)
+                sizes = np.append(sizes, np.zeros(len(added), np.int32))
+
+            for recipe_id, current in recipes.items():
+                position = positions.get(recipe_id)
+                if position is None:
+                    continue
+                old = set(ingredients.get(position, ()))
+                for ingredient_id in old - current:
+                    posting = postings[ingredient_id]
+                    postings[ingredient_id] = np.delete(
+                        posting, np.searchsorted(posting, position)
+                    )
+                for ingredient_id in current - old:
+                    posting = postings.get(
+                        ingredient_id, np.empty(0, np.int32)
+                    )
+                    postings[ingredient_id] = np.insert(
+                        posting, np.searchsorted(posting, position), position
+                    )
+                sizes[position] = len(current)
+                ingredients[position] = tuple(current)
+
+            self._state = state._replace(
+                recipe_ids=recipe_ids,
+                positions=positions,
+                sizes=sizes,
+                ingredients=ingredients,
+                postings=postings,
+            )
+
+    def match(self, ingredient_ids):
+        state = self.get_state()
+        counts = np.zeros(len(state.sizes), dtype=np.int32)
+        for ingredient_id in set(ingredient_ids):
+            posting = state.postings.get(ingredient_id)
+            if posting is not None:
+                counts[posting] += 1
+        matched = np.flatnonzero(counts)
+        return PantryMatches(
+            state.recipe_ids[matched], counts[matched], state.sizes[matched]
+        )
+
+
+pantry_index = PantryIndex()
+
+
+def update_pantry_index(recipe_ids, using='default'):
+    if not pantry_index.is_built:
+        return
+    recipes = {recipe_id: set() for recipe_id in recipe_ids}
+    for recipe_id, ingredient_id in IngredientAmount.objects.using(
+        using
+    ).filter(recipe__in=recipes).order_by().values_list(
+        'recipe', 'ingredient'
+    ):
+        recipes[recipe_id].add(ingredient_id)
+    pantry_index.update(recipes)
+
+
+def schedule_pantry_update(recipe_ids, using='default'):
+    """Update the pantry index once the transaction commits."""
+    schedule_on_commit(update_pantry_index, recipe_ids, using)
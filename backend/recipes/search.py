@@ -0,0 +1,147 @@
+import re
+
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector)
+from django.db import connections
+from django.db.models import F, OuterRef, Q, Subquery
+from django.db.models.expressions import RawSQL
+
+from .utils import schedule_on_commit
+
+FTS_TABLE = 'recipes_recipe_fts'
+# Weights of the name, ingredients and text columns in bm25().
+FTS_WEIGHTS = (10.0, 4.0, 1.0)
+BATCH_SIZE = 500
+
+TOKENS = re.compile(r'\w+')
+
+
+def get_search_vector():
+    """Stored PostgreSQL search vector of a recipe."""
+    from .models import IngredientAmount
+
+    ingredient_names = Subquery(
+        IngredientAmount.objects.filter(
+            recipe=OuterRef('pk')
+        ).order_by().values('recipe').annotate(
+            names=StringAgg('ingredient__name', ' ')
+        ).values('names')
+    )
+    config = settings.SEARCH_CONFIG
+    return (
+        SearchVector('name', weight='A', config=config)
+        + SearchVector(ingredient_names, weight='B', config=config)
+        + SearchVector('text', weight='C', config=config)
+    )
+
+
+def update_fts(connection, recipe_ids):
+    """Rewrite the SQLite FTS5 rows of the given recipes."""
+    from .models import Ingredient, IngredientAmount, Recipe
+
+    with connection.cursor() as cursor:
+        for start in range(0, len(recipe_ids), BATCH_SIZE):
+            batch = recipe_ids[start:start + BATCH_SIZE]
+            placeholders = ', '.join(['%s'] * len(batch))
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})',
+                batch
+            )
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, name, ingredients, text) '
+                'SELECT r.id, r.name, COALESCE(GROUP_CONCAT(i.name, \' \'), '
+                f'\'\'), r.text FROM {Recipe._meta.db_table} r '
+                f'LEFT JOIN {IngredientAmount._meta.db_table} a '
+                'ON a.recipe_id = r.id '
+                f'LEFT JOIN {Ingredient._meta.db_table} i '
+                'ON i.id = a.ingredient_id '
+                f'WHERE r.id IN ({placeholders}) GROUP BY r.id',
+                batch
+            )
+
+
+def update_search_index(recipe_ids, using='default'):
+    """Recalculate the search data of the given recipes."""
+    from .models import Recipe
+
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return
+    connection = connections[using]
+    if connection.vendor == 'postgresql':
+        Recipe.objects.using(using).filter(id__in=recipe_ids).update(
+            search_vector=get_search_vector()
+        )
+    elif connection.vendor == 'sqlite':
+        update_fts(connection, recipe_ids)
+
+
+def rebuild_search_index(using='default'):
+    from .models import Recipe
+
+    update_search_index(
+        Recipe.objects.using(using).values_list('id', flat=True), using
+    )
+
+
+def schedule_search_update(recipe_ids, using='default'):
+    """Update the recipes' search data once the transaction commits.
+
+    Changes of one transaction share a single update, so a recipe saved
+    together with its ingredients is indexed once, in its final state.
+    """
+    schedule_on_commit(update_search_index, recipe_ids, using)
+
+
+def delete_from_search_index(recipe_id, using='default'):
+    connection = connections[using]
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', (recipe_id,)
+            )
+
+
+def get_fts_query(value):
+    """FTS5 query matching every word of ``value`` as a prefix."""
+    return ' '.join(f'"{token}"*' for token in TOKENS.findall(value))
+
+
+def search_recipes(queryset, value):
+    """Filter recipes by a full-text query, best matches first."""
+    vendor = connections[queryset.db].vendor
+    if vendor == 'postgresql':
+        query = SearchQuery(
+            value, config=settings.SEARCH_CONFIG, search_type='websearch'
+        )
+        return queryset.filter(search_vector=query).annotate(
+            search_rank=SearchRank(F('search_vector'), query)
+        ).order_by('-search_rank', '-pub_date', '-id')
+
+    if vendor == 'sqlite':
+        query = get_fts_query(value)
+        if not query:
+            return queryset.none()
+        weights = ', '.join(map(str, FTS_WEIGHTS))
+        quote_name = connections[queryset.db].ops.quote_name
+        meta = queryset.model._meta
+        # The outer query refers to the model table by its own name.
+        recipe_id = f'{quote_name(meta.db_table)}.{quote_name(meta.pk.column)}'
+        return queryset.filter(id__in=RawSQL(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+            (query,)
+        )).annotate(search_rank=RawSQL(
+            f'SELECT -bm25({FTS_TABLE}, {weights}) FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s '
+            f'AND {FTS_TABLE}.rowid = {recipe_id}',
+            (query,)
+        )).order_by('-search_rank', '-pub_date', '-id')
+
+    words = TOKENS.findall(value)
+    for word in words:
+        queryset = queryset.filter(
+            Q(name__icontains=word) | Q(text__icontains=word)
+        )
+    return queryset
@@ -0,0 +1,92 @@
+from django.db import connections, transaction
+
+from .models import IngredientAmount, ShoppingCart, ShoppingListItem
+from .utils import schedule_on_commit
+
+ITEMS_TABLE = ShoppingListItem._meta.db_table
+AMOUNTS_TABLE = IngredientAmount._meta.db_table
+CARTS_TABLE = ShoppingCart._meta.db_table
+
+# Adds the ingredient totals of the selected rows to the shopping lists,
+# creating missing items. Negative totals subtract.
+UPSERT = (
+    f'INSERT INTO {ITEMS_TABLE} (user_id, ingredient_id, total_amount) '
+    '{select} '
+    'ON CONFLICT (user_id, ingredient_id) DO UPDATE SET '
+    f'total_amount = {ITEMS_TABLE}.total_amount + excluded.total_amount'
+)
+
+
+def add_recipes(user_id, recipe_ids, sign=1, using='default'):
+    """Add (or with ``sign=-1`` subtract) the ingredients of recipes to
+    one user's shopping list."""
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return
+    placeholders = ', '.join(['%s'] * len(recipe_ids))
+    with connections[using].cursor() as cursor:
+        cursor.execute(UPSERT.format(select=(
+            f'SELECT %s, ingredient_id, %s * SUM(amount) FROM {AMOUNTS_TABLE} '
+            f'WHERE recipe_id IN ({placeholders}) GROUP BY ingredient_id'
+        )), [user_id, sign, *recipe_ids])
+        if sign < 0:
+            cursor.execute(
+                f'DELETE FROM {ITEMS_TABLE} '
+                'WHERE user_id = %s AND total_amount <= 0',
+                (user_id,)
+            )
+
+
+def remove_recipes(user_id, recipe_ids, using='default'):
+    add_recipes(user_id, recipe_ids, -1, using)
+
+
+def refresh_recipe_carts(recipe_ids, using='default'):
+    """Recompute the shopping lists of every user with one of the recipes
+    in the cart, after the recipes' ingredients changed."""
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return
+    placeholders = ', '.join(['%s'] * len(recipe_ids))
+    users = (
+        f'SELECT user_id FROM {CARTS_TABLE} '
+        f'WHERE recipe_id IN ({placeholders})'
+    )
+    with transaction.atomic(using=using):
+        with connections[using].cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {ITEMS_TABLE} WHERE user_id IN ({users})',
+                recipe_ids
+            )
+            cursor.execute(
+                f'INSERT INTO {ITEMS_TABLE} '
+                '(user_id, ingredient_id, total_amount) '
+                'SELECT c.user_id, a.ingredient_id, SUM(a.amount) '
+                f'FROM {CARTS_TABLE} c '
+                f'JOIN {AMOUNTS_TABLE} a ON a.recipe_id = c.recipe_id '
+                f'WHERE c.user_id IN ({users}) '
+                'GROUP BY c.user_id, a.ingredient_id',
+                recipe_ids
+            )
+
+
+def schedule_cart_refresh(recipe_ids, using='default'):
+    """Refresh the shopping lists with the recipes once the transaction
+    commits, a single time however many amounts were written."""
+    schedule_on_commit(refresh_recipe_carts, recipe_ids, using)
+
+
+def rebuild_shopping_lists(using='default'):
+    """Recompute all shopping lists from the carts, return the row count."""
+    with transaction.atomic(using=using):
+        with connections[using].cursor() as cursor:
+            cursor.execute(f'DELETE FROM {ITEMS_TABLE}')
+            cursor.execute(
+                f'INSERT INTO {ITEMS_TABLE} '
+                '(user_id, ingredient_id, total_amount) '
+                'SELECT c.user_id, a.ingredient_id, SUM(a.amount) '
+                f'FROM {CARTS_TABLE} c '
+                f'JOIN {AMOUNTS_TABLE} a ON a.recipe_id = c.recipe_id '
+                'GROUP BY c.user_id, a.ingredient_id'
+            )
+            return cursor.rowcount
@@ -0,0 +1,157 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
+from django.dispatch import Signal, receiver
+
+from .feed import get_feed
+from .images import schedule_thumbnails
+from .ingredient_index import ingredient_index
+from .models import (Favorite, Ingredient, IngredientAmount, Recipe,
+                     ShoppingCart)
+from .pantry import schedule_pantry_update
+from .search import delete_from_search_index, schedule_search_update
+from .shopping_list import add_recipes, remove_recipes, schedule_cart_refresh
+from .similarity import schedule_similar_update
+
+User = get_user_model()
+
+# Sent with ``recipe_ids`` when recipes change without model signals,
+# e.g. by a queryset update. Empty ids mean "some recipes changed".
+recipes_updated = Signal()
+
+
+def update_counter(model, pk, field, delta):
+    """Atomically add ``delta`` to a counter column, never going below 0."""
+    queryset = model.objects.filter(pk=pk)
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{field: F(field) + delta})
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_ingredient_index(sender, **kwargs):
+    ingredient_index.invalidate()
+
+
+@receiver(post_save, sender=Favorite)
+def favorite_created(sender, instance, created, **kwargs):
+    if created:
+        update_counter(Recipe, instance.recipe_id, 'favorites_count', 1)
+
+
+@receiver(post_delete, sender=Favorite)
+def favorite_deleted(sender, instance, **kwargs):
+    update_counter(Recipe, instance.recipe_id, 'favorites_count', -1)
+
+
+@receiver(post_save, sender=ShoppingCart)
+def shopping_cart_created(sender, instance, created, **kwargs):
+    if created:
+        update_counter(Recipe, instance.recipe_id, 'shopping_cart_count', 1)
+
+
+@receiver(post_delete, sender=ShoppingCart)
+def shopping_cart_deleted(sender, instance, **kwargs):
+    update_counter(Recipe, instance.recipe_id, 'shopping_cart_count', -1)
+
+
+@receiver(post_save, sender=ShoppingCart)
+def shopping_list_recipe_added(sender, instance, created, using, **kwargs):
+    if created:
+        add_recipes(instance.user_id, (instance.recipe_id,), using=using)
+
+
+@receiver(pre_delete, sender=ShoppingCart)
+def shopping_list_recipe_removed(sender, instance, using, **kwargs):
+    # Before the delete, while a deleted recipe still has its ingredients.
+    remove_recipes(instance.user_id, (instance.recipe_id,), using=using)
+
+
+@receiver((post_save, post_delete), sender=IngredientAmount)
+def ingredient_amount_cart_changed(sender, instance, using, **kwargs):
+    schedule_cart_refresh((instance.recipe_id,), using)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_created(sender, instance, created, **kwargs):
+    if created:
+        update_counter(User, instance.author_id, 'recipes_count', 1)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_published(sender, instance, created, using, **kwargs):
+    if created:
+        get_feed().recipe_created(instance, using)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_image_saved(sender, instance, **kwargs):
+    if instance.image and not instance.thumbnails_ready:
+        name = instance.image.name
+        transaction.on_commit(lambda: schedule_thumbnails(name))
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    update_counter(User, instance.author_id, 'recipes_count', -1)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_search_saved(sender, instance, **kwargs):
+    schedule_search_update((instance.pk,))
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_search_deleted(sender, instance, **kwargs):
+    delete_from_search_index(instance.pk)
+
+
+@receiver((post_save, post_delete), sender=IngredientAmount)
+def ingredient_amount_changed(sender, instance, **kwargs):
+    schedule_search_update((instance.recipe_id,))
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_renamed(sender, instance, created, **kwargs):
+    if not created:
+        schedule_search_update(
+            IngredientAmount.objects.filter(
+                ingredient=instance
+            ).values_list('recipe', flat=True).distinct()
+        )
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def recipe_similarity_changed(sender, instance, using, **kwargs):
+    # Deleted recipes leave the index, their rows are deleted by cascade.
+    schedule_similar_update((instance.pk,), using)
+
+
+@receiver((post_save, post_delete), sender=IngredientAmount)
+def ingredient_amount_similarity_changed(sender, instance, using, **kwargs):
+    schedule_similar_update((instance.recipe_id,), using)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_similarity_changed(sender, instance, action, reverse, pk_set,
+                                   using, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        schedule_similar_update((instance.pk,), using)
+    elif pk_set:
+        schedule_similar_update(pk_set, using)
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def recipe_pantry_changed(sender, instance, using, **kwargs):
+    # Also catches ingredients written with bulk_create, which sends no
+    # signals, as the recipe is saved in the same transaction.
+    schedule_pantry_update((instance.pk,), using)
+
+
+@receiver((post_save, post_delete), sender=IngredientAmount)
+def ingredient_amount_pantry_changed(sender, instance, using, **kwargs):
+    schedule_pantry_update((instance.recipe_id,), using)
@@ -0,0 +1,407 @@
+import logging
+import math
+import threading
+import time
+from collections import defaultdict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from django.conf import settings
+from django.db import close_old_connections, connections, transaction
+from django.db.models import Count, Min
+from scipy import sparse
+
+from .models import IngredientAmount, Recipe, SimilarRecipe
+from .utils import LocalIndex, schedule_on_commit
+
+logger = logging.getLogger(__name__)
+
+SIMILAR_TABLE = SimilarRecipe._meta.db_table
+BATCH_SIZE = 500
+
+# One worker keeps updates in commit order and the index single-writer.
+executor = ThreadPoolExecutor(
+    max_workers=1, thread_name_prefix='similar-recipes'
+)
+
+# Deletes rows past the best ``SIMILAR_RECIPES_TOP_K`` of the recipes
+# listed in ``{placeholders}``.
+TRIM = (
+    f'DELETE FROM {SIMILAR_TABLE} WHERE id IN ('
+    'SELECT id FROM ('
+    'SELECT id, ROW_NUMBER() OVER ('
+    'PARTITION BY recipe_id ORDER BY score DESC, similar_id'
+    f') AS position FROM {SIMILAR_TABLE} '
+    'WHERE recipe_id IN ({placeholders})'
+    ') ranked WHERE position > %s)'
+)
+
+IndexState = namedtuple(
+    'IndexState',
+    ('built_at', 'recipe_ids', 'positions', 'columns', 'idf', 'matrix')
+)
+
+
+def get_features(recipe_ids=None, using='default'):
+    """Ingredient and tag features of recipes, all of them by default."""
+    features = defaultdict(set)
+    amounts = IngredientAmount.objects.using(using).order_by()
+    tags = Recipe.tags.through.objects.using(using)
+    if recipe_ids is not None:
+        amounts = amounts.filter(recipe__in=recipe_ids)
+        tags = tags.filter(recipe__in=recipe_ids)
+    for recipe_id, ingredient_id in amounts.values_list(
+        'recipe', 'ingredient'
+    ):
+        features[recipe_id].add(('ingredient', ingredient_id))
+    for recipe_id, tag_id in tags.values_list('recipe', 'tag'):
+        features[recipe_id].add(('tag', tag_id))
+    return features
+
+
+def get_weight(feature):
+    """Term frequency of a feature, tags count less than ingredients."""
+    if feature[0] == 'tag':
+        return settings.SIMILAR_RECIPES_TAG_WEIGHT
+    return 1.0
+
+
+def get_idf(document_frequency, count):
+    return np.log((1 + count) / (1 + document_frequency)) + 1
+
+
+def normalize_rows(matrix):
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return sparse.diags(1 / norms) @ matrix
+
+
+def top_positions(scores, count):
+    """Positions of the ``count`` best positive scores, best first."""
+    positions = np.flatnonzero(scores > 0)
+    if len(positions) > count:
+        positions = positions[
+            np.argpartition(-scores[positions], count - 1)[:count]
+        ]
+    return positions[np.lexsort((positions, -scores[positions]))]
+
+
+class SimilarityIndex(LocalIndex):
+    """Process-local TF-IDF matrix of recipes over ingredients and tags.
+
+    Rows are L2-normalized, so the cosine similarity of two recipes is the
+    dot product of their rows. Saved recipes replace their rows with the
+    column weights of the last build; the whole index is rebuilt after
+    invalidation or once it is older than ``SIMILARITY_INDEX_MAX_AGE``
+    seconds, which also picks up changes made by other processes.
+    """
+
+    max_age_setting = 'SIMILARITY_INDEX_MAX_AGE'
+
+    def build(self, using='default'):
+        recipe_ids = np.array(
+            Recipe.objects.using(using).order_by('id').values_list(
+                'id', flat=True
+            ),
+            dtype=np.int64
+        )
+        features = get_features(using=using)
+        columns = {
+            feature: column
+            for column, feature in enumerate(sorted(
+                set().union(*features.values())
+            ))
+        }
+        rows, cols, weights = [], [], []
+        for position, recipe_id in enumerate(recipe_ids.tolist()):
+            for feature in features.get(recipe_id, ()):
+                rows.append(position)
+                cols.append(columns[feature])
+                weights.append(get_weight(feature))
+        cols = np.array(cols, dtype=np.int64)
+        idf = get_idf(
+            np.bincount(cols, minlength=len(columns)), len(recipe_ids)
+        )
+        matrix = sparse.csr_matrix(
+            (np.array(weights) * idf[cols], (rows, cols)),
+            shape=(len(recipe_ids), len(columns)),
+            dtype=np.float32
+        )
+        return IndexState(
+            built_at=time.monotonic(),
+            recipe_ids=recipe_ids,
+            positions={
+                recipe_id: position
+                for position, recipe_id in enumerate(recipe_ids.tolist())
+            },
+            columns=columns,
+            idf=idf,
+            matrix=normalize_rows(matrix).tocsr(),
+        )
+
+    def vectorize(self, state, features):
+        """Rows of recipes not in the index, ``features`` is a list of
+        feature sets known to the index."""
+        rows, cols, weights = [], [], []
+        for position, recipe_features in enumerate(features):
+            row_cols = [state.columns[feature] for feature in recipe_features]
+            row_weights = [
+                get_weight(feature) * state.idf[column]
+                for feature, column in zip(recipe_features, row_cols)
+            ]
+            norm = math.sqrt(sum(weight ** 2 for weight in row_weights)) or 1
+            rows += [position] * len(row_cols)
+            cols += row_cols
+            weights += [weight / norm for weight in row_weights]
+        return sparse.csr_matrix(
+            (weights, (rows, cols)),
+            shape=(len(features), len(state.columns)),
+            dtype=np.float32
+        )
+
+    def update(self, features, removed=(), using='default'):
+        """Replace the rows of the recipes in ``features`` (recipe id to
+        feature set) and drop the ``removed`` ones.
+
+        Features the index has no column for, e.g. a first use of an
+        ingredient, cause a full rebuild instead.
+        """
+        self.get_state(using)
+        with self._lock:
+            state = self._state
+            if state is None or any(
+                feature not in state.columns
+                for recipe_features in features.values()
+                for feature in recipe_features
+            ):
+                self._state = self.build(using)
+                return self._state
+
+            keep = np.ones(len(state.recipe_ids), dtype=bool)
+            keep[[
+                state.positions[recipe_id]
+                for recipe_id in set(features).union(removed)
+                if recipe_id in state.positions
+            ]] = False
+            added = sorted(features)
+            recipe_ids = np.concatenate([
+                state.recipe_ids[keep], np.array(added, dtype=np.int64)
+            ])
+            self._state = state._replace(
+                recipe_ids=recipe_ids,
+                positions={
+                    recipe_id: position
+                    for position, recipe_id in enumerate(recipe_ids.tolist())
+                },
+                matrix=sparse.vstack([
+                    state.matrix[keep],
+                    self.vectorize(
+                        state,
+                        [list(features[recipe_id]) for recipe_id in added]
+                    ),
+                ]).tocsr(),
+            )
+            return self._state
+
+
+similarity_index = SimilarityIndex()
+
+
+def build_similar_recipes(top_k=None, chunk_size=None, using='default'):
+    """Recompute the similar recipes of every recipe, return the row count.
+
+    Similarities are computed for ``chunk_size`` recipes at a time as one
+    sparse product with the whole matrix, so memory stays bounded by
+    ``chunk_size`` dense rows.
+    """
+    top_k = top_k or settings.SIMILAR_RECIPES_TOP_K
+    chunk_size = chunk_size or settings.SIMILAR_RECIPES_CHUNK_SIZE
+    state = similarity_index.rebuild(using)
+    matrix = state.matrix
+    transposed = matrix.T.tocsr()
+    recipe_ids = state.recipe_ids.tolist()
+
+    rows = []
+    for start in range(0, len(recipe_ids), chunk_size):
+        block = (matrix[start:start + chunk_size] @ transposed).toarray()
+        # A recipe is not similar to itself.
+        block[
+            np.arange(len(block)), np.arange(start, start + len(block))
+        ] = 0
+        for offset, scores in enumerate(block):
+            rows += [
+                SimilarRecipe(
+                    recipe_id=recipe_ids[start + offset],
+                    similar_id=recipe_ids[position],
+                    score=float(scores[position]),
+                )
+                for position in top_positions(scores, top_k)
+            ]
+
+    with transaction.atomic(using=using):
+        SimilarRecipe.objects.using(using).all().delete()
+        SimilarRecipe.objects.using(using).bulk_create(
+            rows, batch_size=BATCH_SIZE
+        )
+    return len(rows)
+
+
+def trim_similar_recipes(recipe_ids, using='default'):
+    recipe_ids = list(recipe_ids)
+    with connections[using].cursor() as cursor:
+        for start in range(0, len(recipe_ids), BATCH_SIZE):
+            batch = recipe_ids[start:start + BATCH_SIZE]
+            cursor.execute(
+                TRIM.format(placeholders=', '.join(['%s'] * len(batch))),
+                [*batch, settings.SIMILAR_RECIPES_TOP_K]
+            )
+
+
+def get_thresholds(recipe_ids, top_k, using='default'):
+    """Score a recipe's list must beat to take a place in it, 0 while the
+    list is not full."""
+    recipe_ids = list(recipe_ids)
+    thresholds = {}
+    for start in range(0, len(recipe_ids), BATCH_SIZE):
+        thresholds.update(
+            (recipe_id, score if count >= top_k else 0)
+            for recipe_id, score, count in SimilarRecipe.objects.using(
+                using
+            ).filter(
+                recipe__in=recipe_ids[start:start + BATCH_SIZE]
+            ).order_by().values('recipe').annotate(
+                min_score=Min('score'), count=Count('id')
+            ).values_list('recipe', 'min_score', 'count')
+        )
+    return thresholds
+
+
+def update_similar_recipes(recipe_ids, using='default'):
+    """Score changed recipes against the index and rewrite their lists.
+
+    The recipes also replace the worst neighbours of the
+    ``SIMILAR_RECIPES_CANDIDATES`` recipes closest to them. Lists that
+    lose a neighbour this way stay shorter until ``build_similar_recipes``
+    runs again.
+    """
+    recipe_ids = set(recipe_ids)
+    if not recipe_ids:
+        return
+    top_k = settings.SIMILAR_RECIPES_TOP_K
+    existing = set(Recipe.objects.using(using).filter(
+        id__in=recipe_ids
+    ).values_list('id', flat=True))
+    features = get_features(existing, using)
+    state = similarity_index.update(
+        {recipe_id: features.get(recipe_id, set()) for recipe_id in existing},
+        recipe_ids - existing,
+        using
+    )
+    if not existing:
+        return
+
+    all_ids = state.recipe_ids.tolist()
+    rows = {}
+    candidates = {}
+    for recipe_id in existing:
+        position = state.positions[recipe_id]
+        scores = (state.matrix @ state.matrix[position].T).toarray().ravel()
+        scores[position] = 0
+        for similar in top_positions(scores, top_k):
+            rows[recipe_id, all_ids[similar]] = scores[similar]
+        candidates[recipe_id] = [
+            (all_ids[neighbour], scores[neighbour])
+            for neighbour in top_positions(
+                scores, settings.SIMILAR_RECIPES_CANDIDATES
+            )
+            if all_ids[neighbour] not in existing
+        ]
+
+    thresholds = get_thresholds(
+        {
+            neighbour_id
+            for neighbours in candidates.values()
+            for neighbour_id, _ in neighbours
+        },
+        top_k, using
+    )
+    for recipe_id, neighbours in candidates.items():
+        for neighbour_id, score in neighbours:
+            if score > thresholds.get(neighbour_id, 0):
+                rows[neighbour_id, recipe_id] = score
+
+    with transaction.atomic(using=using):
+        SimilarRecipe.objects.using(using).filter(
+            recipe__in=existing
+        ).delete()
+        SimilarRecipe.objects.using(using).filter(
+            similar__in=existing
+        ).delete()
+        SimilarRecipe.objects.using(using).bulk_create(
+            [
+                SimilarRecipe(
+                    recipe_id=recipe_id,
+                    similar_id=similar_id,
+                    score=float(score),
+                )
+                for (recipe_id, similar_id), score in rows.items()
+            ],
+            batch_size=BATCH_SIZE
+        )
+        trim_similar_recipes(
+            {recipe_id for recipe_id, _ in rows} - existing, using
+        )
+
+
+class SimilarUpdateQueue:
+    """Recipes waiting to be rescored by the background worker.
+
+    Recipes queued while the worker is busy are rescored together by its
+    next run, so a burst of saves costs one index update.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = defaultdict(set)
+
+    def add(self, recipe_ids, using='default'):
+        if connections[using].vendor == 'sqlite':
+            # SQLite takes one writer at a time, a writing worker would
+            # make requests fail with "database is locked".
+            update_similar_recipes(recipe_ids, using)
+            return
+        with self._lock:
+            scheduled = bool(self._pending)
+            self._pending[using].update(recipe_ids)
+        if not scheduled:
+            executor.submit(self.run)
+
+    def run(self):
+        with self._lock:
+            pending = dict(self._pending)
+            self._pending.clear()
+        try:
+            for using, recipe_ids in pending.items():
+                try:
+                    update_similar_recipes(recipe_ids, using)
+                except Exception:
+                    logger.exception(
+                        'Не удалось обновить похожие рецепты %s',
+                        sorted(recipe_ids)
+                    )
+        finally:
+            close_old_connections()
+
+
+similar_updates = SimilarUpdateQueue()
+
+
+def schedule_similar_update(recipe_ids, using='default'):
+    """Rescore the recipes once the transaction commits, in their final
+    state and with a single update per transaction.
+
+    The index is built and the recipes rescored by the background worker,
+    off the request thread. On SQLite, which allows one writer at a time,
+    they are rescored right after the commit on the request thread.
+    """
+    schedule_on_commit(similar_updates.add, recipe_ids, using)
@@ -0,0 +1,34 @@
+import hashlib
+from pathlib import PurePosixPath
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+
+class ContentHashStorage(FileSystemStorage):
+    """Storage that names files after the SHA-256 of their content.
+
+    Identical uploads map to the same name, and saving an existing name
+    reuses the stored file instead of writing a renamed copy.
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        path = PurePosixPath(name)
+        name = str(path.with_name(digest.hexdigest() + path.suffix.lower()))
+        return super().save(name, content, max_length)
+
+    def get_available_name(self, name, max_length=None):
+        return name
+
+    def _save(self, name, content):
+        if self.exists(name):
+            return name
+        return super()._save(name, content)
@@ -0,0 +1,63 @@
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TransactionTestCase
+
+
+class MergeDuplicateIngredientsTests(TransactionTestCase):
+    migrate_from = [('recipes', '0008_alter_tag_color')]
+    migrate_to = [('recipes', '0009_ingredient_unique_name_unit')]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+
+    def test_duplicates_merged_into_one_row_per_recipe(self):
+        apps = self.migrate(self.migrate_from)
+        User = apps.get_model('users', 'User')
+        Ingredient = apps.get_model('recipes', 'Ingredient')
+        IngredientAmount = apps.get_model('recipes', 'IngredientAmount')
+        Recipe = apps.get_model('recipes', 'Recipe')
+
+        author = User.objects.create(
+            email='author@example.com', username='author',
+            first_name='Автор', last_name='Рецептов'
+        )
+        first = Ingredient.objects.create(name='соль', measurement_unit='г')
+        second = Ingredient.objects.create(name='соль', measurement_unit='г')
+        recipe = Recipe.objects.create(
+            author=author, name='суп', text='описание', cooking_time=10
+        )
+        IngredientAmount.objects.create(
+            recipe=recipe, ingredient=first, amount=5
+        )
+        IngredientAmount.objects.create(
+            recipe=recipe, ingredient=second, amount=7
+        )
+        recipe.ingredients.add(first, second)
+
+        apps = self.migrate(self.migrate_to)
+        Ingredient = apps.get_model('recipes', 'Ingredient')
+        IngredientAmount = apps.get_model('recipes', 'IngredientAmount')
+        Recipe = apps.get_model('recipes', 'Recipe')
+
+        self.assertEqual(
+            list(Ingredient.objects.values_list('id', flat=True)),
+            [first.id]
+        )
+        self.assertEqual(
+            list(IngredientAmount.objects.filter(
+                recipe_id=recipe.id
+            ).values_list('ingredient_id', 'amount')),
+            [(first.id, 12)]
+        )
+        self.assertEqual(
+            list(Recipe.objects.get(id=recipe.id).ingredients.values_list(
+                'id', flat=True
+            )),
+            [first.id]
+        )
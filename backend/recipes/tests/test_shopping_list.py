@@ -0,0 +1,63 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.test import TransactionTestCase
+
+from recipes.models import (Ingredient, IngredientAmount, Recipe,
+                            ShoppingCart, ShoppingListItem)
+
+User = get_user_model()
+
+
+class ShoppingListAmountsTests(TransactionTestCase):
+
+    def setUp(self):
+        author = User.objects.create_user(
+            email='author@example.com', username='author',
+            first_name='Автор', last_name='Рецептов', password='pass12345word'
+        )
+        self.buyer = User.objects.create_user(
+            email='buyer@example.com', username='buyer',
+            first_name='Покупатель', last_name='Продуктов',
+            password='pass12345word'
+        )
+        self.salt = Ingredient.objects.create(
+            name='соль', measurement_unit='г'
+        )
+        self.sugar = Ingredient.objects.create(
+            name='сахар', measurement_unit='г'
+        )
+        self.soup, self.cake = (
+            Recipe.objects.create(
+                author=author, name=name, text='описание', cooking_time=10
+            )
+            for name in ('суп', 'торт')
+        )
+        self.soup_salt = IngredientAmount.objects.create(
+            recipe=self.soup, ingredient=self.salt, amount=5
+        )
+        IngredientAmount.objects.create(
+            recipe=self.cake, ingredient=self.salt, amount=1
+        )
+        ShoppingCart.objects.create(user=self.buyer, recipe=self.soup)
+        ShoppingCart.objects.create(user=self.buyer, recipe=self.cake)
+
+    def get_totals(self):
+        return dict(ShoppingListItem.objects.filter(
+            user=self.buyer
+        ).values_list('ingredient', 'total_amount'))
+
+    def test_amount_saved_outside_serializer(self):
+        self.assertEqual(self.get_totals(), {self.salt.id: 6})
+        with transaction.atomic():
+            self.soup_salt.amount = 20
+            self.soup_salt.save()
+            IngredientAmount.objects.create(
+                recipe=self.soup, ingredient=self.sugar, amount=3
+            )
+        self.assertEqual(
+            self.get_totals(), {self.salt.id: 21, self.sugar.id: 3}
+        )
+
+    def test_amount_deleted_outside_serializer(self):
+        self.soup_salt.delete()
+        self.assertEqual(self.get_totals(), {self.salt.id: 1})
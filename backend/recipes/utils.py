@@ -0,0 +1,84 @@
+import threading
+import time
+
+from django.conf import settings
+from django.db import transaction
+
+
+class BatchedCallback:
+    """on_commit callback that calls ``func`` once with every id
+    collected during the transaction."""
+
+    def __init__(self, func, using):
+        self.func = func
+        self.using = using
+        self.ids = set()
+
+    def __call__(self):
+        self.func(self.ids, self.using)
+
+
+def schedule_on_commit(func, ids, using='default'):
+    """Call ``func(ids, using)`` once the transaction commits.
+
+    Calls for the same ``func`` within one transaction share a single
+    callback, so rows saved together are processed once, in their final
+    state. Outside a transaction ``func`` runs at once.
+    """
+    connection = transaction.get_connection(using)
+    # Django keeps no public way to look at the registered callbacks,
+    # entries of run_on_commit are (savepoint ids, callback, ...) tuples.
+    for entry in connection.run_on_commit:
+        callback = entry[1]
+        if (
+            isinstance(callback, BatchedCallback)
+            and callback.func == func and callback.using == using
+        ):
+            callback.ids.update(ids)
+            return
+    callback = BatchedCallback(func, using)
+    callback.ids.update(ids)
+    transaction.on_commit(callback, using)
+
+
+class LocalIndex:
+    """Process-local index built lazily from the database.
+
+    The state is an immutable snapshot with a ``built_at`` field, readers
+    keep using the one they got while a writer replaces it. The index is
+    rebuilt after invalidation or once it is older than the number of
+    seconds in the ``max_age_setting`` setting, which also picks up
+    changes made by other processes.
+    """
+
+    max_age_setting = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state = None
+
+    @property
+    def is_built(self):
+        return self._state is not None
+
+    def invalidate(self):
+        self._state = None
+
+    def build(self, using='default'):
+        raise NotImplementedError
+
+    def get_state(self, using='default'):
+        state = self._state
+        max_age = getattr(settings, self.max_age_setting)
+        if state is not None and time.monotonic() - state.built_at < max_age:
+            return state
+
+        with self._lock:
+            if self._state is state:
+                self._state = self.build(using)
+            return self._state
+
+    def rebuild(self, using='default'):
+        with self._lock:
+            self._state = self.build(using)
+            return self._state
@@ -0,0 +1,50 @@
+# Generated by Django 3.2.16 on 2026-10-18 16:56
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_related(model, field):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef('pk')}).order_by().values(
+                field
+            ).annotate(count=Count('pk')).values('count')
+        ),
+        0
+    )
+
+
+def fill_counters(apps, schema_editor):
+    User = apps.get_model('users', 'User')
+    User.objects.update(
+        recipes_count=count_related(
+            apps.get_model('recipes', 'Recipe'), 'author'
+        ),
+        followers_count=count_related(
+            apps.get_model('users', 'Subscribtion'), 'author'
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_auto_20221125_2250'),
+        ('recipes', '0011_recipe_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='подписчиков'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='recipes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='рецептов'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -15,6 +15,16 @@ class User(AbstractUser):
     first_name = models.CharField(max_length=150, blank=False)
     last_name = models.CharField(max_length=150, blank=False)
     role = models.CharField(max_length=20, choices=ROLES, default=USER)
+    recipes_count = models.PositiveIntegerField(
+        verbose_name='рецептов',
+        default=0,
+        editable=False
+    )
+    followers_count = models.PositiveIntegerField(
+        verbose_name='подписчиков',
+        default=0,
+        editable=False
+    )
 
     REQUIRED_FIELDS = ['first_name', 'last_name', 'username', ]
     USERNAME_FIELD = 'email'
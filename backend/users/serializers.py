@@ -1,6 +1,7 @@
 from django.contrib.auth import get_user_model, password_validation
 from rest_framework import serializers
 
+from recipes.images import thumbnail_url
 from recipes.models import Recipe
 
 from .models import Subscribtion
@@ -22,16 +23,27 @@ class UserSerializer(serializers.ModelSerializer):
         )
         extra_kwargs = {'password': {'write_only': True}}
 
-    def get_is_subscribed(self, obj):
-        current_user = self.context['request'].user
-        user_to_subscribe = obj.id
-        if current_user.is_anonymous:
-            return False
-        flag = Subscribtion.objects.filter(
-            user=current_user, author=user_to_subscribe
-        ).exists()
+    def get_followed_authors(self):
+        """Ids of authors followed by the current user.
+
+        Loaded once and kept in the serializer context, which is shared
+        by nested and list serializers of the same response.
+        """
+        if 'followed_authors' not in self.context:
+            current_user = self.context['request'].user
+            followed_authors = set()
+            if not current_user.is_anonymous:
+                followed_authors = set(
+                    Subscribtion.objects.filter(
+                        user=current_user
+                    ).values_list('author_id', flat=True)
+                )
+            self.context['followed_authors'] = followed_authors
+
+        return self.context['followed_authors']
 
-        return flag
+    def get_is_subscribed(self, obj):
+        return obj.id in self.get_followed_authors()
 
     def create(self, validated_data):
         user = User(
@@ -75,17 +87,26 @@ class SubscriptionSerializer(serializers.ModelSerializer):
 class ShortRecipeSerializer(serializers.ModelSerializer):
     """Short Recipe Descriotion For User's Subscribing List."""
 
+    image = serializers.SerializerMethodField()
+
     class Meta:
         model = Recipe
         fields = ('id', 'name', 'image', 'cooking_time')
 
+    def get_image(self, obj):
+        if not obj.image:
+            return None
+        if obj.thumbnails_ready:
+            return thumbnail_url(obj.image.name, 'card')
+        return obj.image.url
+
 
 class SubscriptionListSerializer(UserSerializer):
     "List Of Subscribed Users."
 
     # recipes = ShortRecipeSerializer(many=True)
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField()
+    recipes_count = serializers.ReadOnlyField()
 
     class Meta:
         model = User
@@ -95,13 +116,11 @@ class SubscriptionListSerializer(UserSerializer):
         )
 
     def get_recipes(self, obj):
-        num = int(self.context['request'].query_params['recipes_limit'])
-        queryset = Recipe.objects.all()[:num]
-        list = ShortRecipeSerializer(queryset, many=True).data
-        return list
-
-    def get_recipes_count(self, obj):
-        return Recipe.objects.filter(author=obj).count()
+        if hasattr(obj, 'latest_recipes'):
+            queryset = obj.latest_recipes
+        else:
+            queryset = obj.recipes.all()[:self.context['recipes_limit']]
+        return ShortRecipeSerializer(queryset, many=True).data
 
 
 class ChangePasswordSerializer(serializers.Serializer):
@@ -0,0 +1,66 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from recipes.feed import get_feed
+from recipes.signals import update_counter
+
+from .models import Subscribtion
+
+User = get_user_model()
+
+# Fields whose changes other apps react to.
+TRACKED_FIELDS = (
+    'username', 'email', 'first_name', 'last_name', 'password', 'is_active',
+)
+
+
+@receiver(pre_save, sender=User)
+def remember_stored_fields(sender, instance, raw, using, update_fields,
+                           **kwargs):
+    instance._stored_fields = None
+    if raw or instance._state.adding:
+        return
+    fields = [
+        name for name in TRACKED_FIELDS
+        if update_fields is None or name in update_fields
+    ]
+    instance._stored_fields = {}
+    if fields:
+        instance._stored_fields = User.objects.using(using).filter(
+            pk=instance.pk
+        ).values(*fields).first()
+
+
+def get_changed_fields(user, fields):
+    """Tracked fields the user's current save changes. All of them count
+    as changed when the stored row is unknown."""
+    stored = getattr(user, '_stored_fields', None)
+    if stored is None:
+        return set(fields)
+    return {
+        name for name in fields
+        if name in stored and stored[name] != getattr(user, name)
+    }
+
+
+@receiver(post_save, sender=Subscribtion)
+def subscription_created(sender, instance, created, **kwargs):
+    if created:
+        update_counter(User, instance.author_id, 'followers_count', 1)
+
+
+@receiver(post_delete, sender=Subscribtion)
+def subscription_deleted(sender, instance, **kwargs):
+    update_counter(User, instance.author_id, 'followers_count', -1)
+
+
+@receiver(post_save, sender=Subscribtion)
+def feed_subscribed(sender, instance, created, using, **kwargs):
+    if created:
+        get_feed().subscribed(instance.user_id, instance.author_id, using)
+
+
+@receiver(post_delete, sender=Subscribtion)
+def feed_unsubscribed(sender, instance, using, **kwargs):
+    get_feed().unsubscribed(instance.user_id, instance.author_id, using)
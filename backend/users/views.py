@@ -1,10 +1,15 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db.models import OuterRef, Prefetch, Subquery
 from django.shortcuts import get_object_or_404
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 
+from api.metrics import RequestMetricsMixin
+from recipes.models import Recipe
+
 from .models import Subscribtion
 from .pagination import UsersPagination
 from .serializers import (ChangePasswordSerializer,
@@ -16,7 +21,7 @@ from .serializers import (ChangePasswordSerializer,
 User = get_user_model()
 
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(RequestMetricsMixin, viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     pagination_class = UsersPagination
@@ -27,9 +32,39 @@ class UserViewSet(viewsets.ModelViewSet):
 
         return (IsAuthenticated(),)
 
+    def get_recipes_limit(self):
+        try:
+            recipes_limit = int(self.request.query_params['recipes_limit'])
+        except (KeyError, ValueError):
+            return settings.RECIPES_LIMIT_DEFAULT
+        if recipes_limit < 0:
+            return settings.RECIPES_LIMIT_DEFAULT
+        return min(recipes_limit, settings.RECIPES_LIMIT_MAX)
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.action == 'subscriptions':
+            context['recipes_limit'] = self.get_recipes_limit()
+        return context
+
     def get_queryset(self):
         if self.action == 'subscriptions':
-            return User.objects.filter(subscribing__user=self.request.user)
+            latest_recipes = Recipe.objects.filter(
+                id__in=Subquery(
+                    Recipe.objects.filter(
+                        author=OuterRef('author')
+                    ).values('id')[:self.get_recipes_limit()]
+                )
+            )
+            return User.objects.filter(
+                subscribing__user=self.request.user
+            ).prefetch_related(
+                Prefetch(
+                    'recipes',
+                    queryset=latest_recipes,
+                    to_attr='latest_recipes'
+                )
+            )
         return User.objects.all()
 
     @action(
@@ -40,9 +75,7 @@ class UserViewSet(viewsets.ModelViewSet):
     )
     def self_user(self, request):
         user = get_object_or_404(User, pk=request.user.id)
-        serializer = self.get_serializer(user, data=request.data, partial=True)
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
+        serializer = self.get_serializer(user)
 
         return Response(serializer.data, status=status.HTTP_200_OK)
 